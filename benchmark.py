@@ -0,0 +1,26 @@
+import sys
+import os
+import subprocess
+
+# Benchmark of each assignment, with the arguments of its default sweep
+BENCHMARKS = {
+    'hw1': ['sweep'],
+    'hw2': [],
+    'hw3': [],
+}
+
+
+def main(*names):
+    """
+        Run the benchmarks of the given assignments (all of them by default) one after another.
+
+        ex. python benchmark.py hw1 hw3
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in names or BENCHMARKS:
+        print("== %s" % name, flush=True)
+        subprocess.run([sys.executable, os.path.join(directory, name, 'benchmark.py')] + BENCHMARKS[name], check=True)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -1,13 +1,256 @@
 import sys
+import os
+import json
+import math
+import random
+import time
+import mmap
+import struct
+from concurrent.futures import ProcessPoolExecutor
 from itertools import combinations
+from array import array
+
+CACHE_MAGIC = b'HW1CSR\x00\x00'  # first 8 bytes of a cached transaction file
+CACHE_HEADER = struct.Struct('=8sqqqq')  # magic, input file size, input file mtime (ns), number of transactions, number of items
+
+run_metrics = None  # {'phases': {phase: seconds}, 'counters': {name: count}}, recorded only with --metrics
+
+def add_metric(name, value=1, key=None):
+    """
+        Adds value to the counter, or to its entry for the key (ex. the length k of the itemsets).
+        Does nothing unless the metrics are recorded.
+    """
+    if run_metrics is None:
+        return
+    if key is None:
+        run_metrics['counters'][name] = run_metrics['counters'].get(name, 0) + value
+    else:
+        counter = run_metrics['counters'].setdefault(name, dict())
+        counter[key] = counter.get(key, 0) + value
+
+def merge_metrics(counters):
+    """
+        Adds the counters of a worker process to the counters of this process.
+    """
+    for name, value in counters.items():
+        if type(value) is dict:
+            for key, key_value in value.items():
+                add_metric(name, key_value, key)
+        else:
+            add_metric(name, value)
+
+def record_phase(phase, start):
+    """
+        Adds the seconds since start to the phase, and returns the time now as the start of the next phase.
+    """
+    now = time.perf_counter()
+    if run_metrics is not None:
+        run_metrics['phases'][phase] = run_metrics['phases'].get(phase, 0.0) + now - start
+    return now
+
+def write_metrics(metrics_file_name):
+    """
+        Writes the recorded metrics into a JSON file, if its name is given.
+        ex) {"phases": {"load": 0.01, "mine": 0.52, "rules": 0.08},
+             "counters": {"db_scans": 4, "candidates_generated": {"2": 120, "3": 31}, ..., "rules": 11656}}
+    """
+    if metrics_file_name is not None:
+        with open(metrics_file_name, 'w') as file:
+            json.dump(run_metrics, file, indent=2)
+
+class TransactionDatabase:
+    """
+        Transactions(DB) in CSR form. The items of the t-th transaction are items[offsets[t]:offsets[t+1]].
+        Each transaction is stored once as ascending, distinct int item ids, so it takes 4 bytes per item
+        instead of a list of strings.
+    """
+
+    def __init__(self, offsets, items, buffer=None):
+        self.offsets = offsets  # array('q') or memoryview of int64, length: (number of transactions + 1)
+        self.items = items  # array('i') or memoryview of int32
+        self.buffer = buffer  # mmap which offsets and items refer to, if they are loaded from a cache file
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        offsets = self.offsets
+        items = self.items
+        for t in range(len(offsets) - 1):
+            yield items[offsets[t]:offsets[t + 1]]
+
+    def get_shard(self, start, end):
+        """
+            Return the transactions from start to end-1 as a new TransactionDatabase which owns its arrays.
+        """
+        offsets = array('q', (offset - self.offsets[start] for offset in self.offsets[start:end + 1]))
+        items = array('i')
+        items.frombytes(bytes(self.items[self.offsets[start]:self.offsets[end]]))
+        return TransactionDatabase(offsets, items)
+
+def read_transactions(input_file_name):
+    """
+        Reads the transactions line by line and encodes them into a TransactionDatabase,
+        without keeping the lines or the item strings in memory.
+
+        Parameters:
+            input_file_name (str): Name of the input file. Each line is a transaction of item ids separated by '\t'.
+        Return:
+            TransactionDatabase: Encoded transactions.
+    """
+    offsets = array('q', [0])
+    items = array('i')
+    with open(input_file_name, 'r') as file:
+        for line in file:
+            items.extend(sorted(set(int(item) for item in line.split())))
+            offsets.append(len(items))
+    return TransactionDatabase(offsets, items)
+
+def write_transaction_cache(transactions, input_file_name, cache_file_name):
+    """
+        Writes the encoded transactions into a binary file, which load_transactions can memory-map later.
+        The size and mtime of the input file are kept in the header to detect a stale cache.
+    """
+    input_stat = os.stat(input_file_name)
+    with open(cache_file_name, 'wb') as file:
+        file.write(CACHE_HEADER.pack(CACHE_MAGIC, input_stat.st_size, input_stat.st_mtime_ns,
+                                     len(transactions), len(transactions.items)))
+        transactions.offsets.tofile(file)
+        transactions.items.tofile(file)
+
+def load_transactions(input_file_name, cache_file_name=None):
+    """
+        Loads the transactions of the input file.
+        If cache_file_name is given, the encoded transactions are memory-mapped from the cache file
+        when it was made from the current input file. Otherwise the cache file is (re)written after reading the input.
+
+        Parameters:
+            input_file_name (str): Name of the input file. ex) "input.txt"
+            cache_file_name (str): Name of the binary cache file. ex) "input.bin"
+        Return:
+            TransactionDatabase: Encoded transactions.
+    """
+    if cache_file_name is None:
+        return read_transactions(input_file_name)
+
+    if os.path.exists(cache_file_name) and os.path.getsize(cache_file_name) >= CACHE_HEADER.size:
+        with open(cache_file_name, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, input_size, input_mtime, num_of_transactions, num_of_items = CACHE_HEADER.unpack_from(buffer)
+        input_stat = os.stat(input_file_name)
+        if magic == CACHE_MAGIC and (input_size, input_mtime) == (input_stat.st_size, input_stat.st_mtime_ns):
+            view = memoryview(buffer)
+            offsets_start = CACHE_HEADER.size
+            items_start = offsets_start + 8 * (num_of_transactions + 1)
+            offsets = view[offsets_start:items_start].cast('q')
+            items = view[items_start:items_start + 4 * num_of_items].cast('i')
+            return TransactionDatabase(offsets, items, buffer)
+        buffer.close()
+
+    transactions = read_transactions(input_file_name)
+    write_transaction_cache(transactions, input_file_name, cache_file_name)
+    return transactions
+
+def generate_candidate_itemsets(frequent_itemsets, k, record_metrics=False):
+    """
+        Generates the pruned candidates (C_k+1) from the frequent itemsets of length k (L_k).
+        Two itemsets are joined only when they share the same first (k-1) items, and a candidate is kept
+        only if all of its subsets of length k are frequent (downward closure), checked by dict lookups.
+
+        Parameters:
+        frequent_itemsets (dict): Frequent itemsets of length k with their counts. (ex. {(7,): 120, (14,): 128})
+        k (int): Length of the itemsets in frequent_itemsets
+        record_metrics (bool): Whether the candidates count as a level of mining in the metrics
+        Return:
+        list: A list of candidate itemsets of length k+1 in ascending order, each of them is an ascending tuple.
+        ex) [(7, 14), (9, 14)]
+    """
+    candidate_itemsets = []
+    sorted_itemsets = sorted(frequent_itemsets)  # itemsets which share a prefix become adjacent
+    group_start = 0
+    num_of_joined = 0
+    for i in range(1, len(sorted_itemsets) + 1):
+        if i < len(sorted_itemsets) and sorted_itemsets[i][:-1] == sorted_itemsets[group_start][:-1]:
+            continue
+        # sorted_itemsets[group_start:i] share the prefix (ex. (1, 3, 5), (1, 3, 8), (1, 3, 9))
+        num_of_joined += (i - group_start) * (i - group_start - 1) // 2
+        for j in range(group_start, i):
+            for l in range(j + 1, i):
+                candidate = sorted_itemsets[j] + sorted_itemsets[l][-1:]
+                # subsets without the last or the second last item are the two joined itemsets
+                if all(candidate[:m] + candidate[m + 1:] in frequent_itemsets for m in range(k - 1)):
+                    candidate_itemsets.append(candidate)
+        group_start = i
+    if record_metrics and run_metrics is not None:
+        add_metric('candidates_generated', num_of_joined, k + 1)
+        add_metric('candidates_pruned', num_of_joined - len(candidate_itemsets), k + 1)
+    return candidate_itemsets
+
+def build_candidate_trie(candidate_itemsets):
+    """
+        Builds a trie of the candidate itemsets. Each level is a dictionary of item -> child,
+        and the children of the last level are the candidate itemsets themselves.
+
+        Parameters:
+        candidate_itemsets (list): Ascending tuples of the same length. ex) [(1, 3), (1, 8), (3, 8)]
+        Return:
+        dict: The root of the trie. ex) {1: {3: (1, 3), 8: (1, 8)}, 3: {8: (3, 8)}}
+    """
+    root = dict()
+    for itemset in candidate_itemsets:
+        node = root
+        for item in itemset[:-1]:
+            node = node.setdefault(item, dict())
+        node[itemset[-1]] = itemset
+    return root
+
+def count_candidate_itemsets(transactions, candidate_itemsets, itemset_count_dict=None):
+    """
+        Counts the support of the candidate itemsets with one DB scan. Each transaction walks the candidate trie
+        along its own (sorted) items, so only the candidates contained in the transaction are visited.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB), where each transaction is a sequence of
+        ascending, distinct int items (ex. [2, 7, 14])
+        candidate_itemsets (list): Ascending tuples of the same length. ex) [(1, 3), (1, 8), (3, 8)]
+        itemset_count_dict (dict): Counts are added to this dictionary if it is given.
+        Return:
+        dict: itemset -> count, for the candidates found at least once, in the order they are first found.
+        ex) {(1, 8): 58, (3, 8): 120}
+    """
+    if itemset_count_dict is None:
+        itemset_count_dict = dict()
+    if len(candidate_itemsets) == 0:
+        return itemset_count_dict
+    trie = build_candidate_trie(candidate_itemsets)
+    length = len(candidate_itemsets[0])
+    if run_metrics is not None:
+        add_metric('db_scans')
+        add_metric('candidates_counted', len(candidate_itemsets), length)
+
+    def visit(node, items, start, depth):
+        # items[i] can be the depth-th item only if enough items are left after it
+        for i in range(start, len(items) - length + depth + 1):
+            child = node.get(items[i])
+            if child is None:
+                continue
+            if depth == length - 1:
+                itemset_count_dict[child] = itemset_count_dict.get(child, 0) + 1
+            else:
+                visit(child, items, i + 1, depth + 1)
+
+    for transaction in transactions:
+        if len(transaction) >= length:
+            visit(trie, transaction, 0, 0)
+    return itemset_count_dict
 
 def get_frequent_itemset_list(transactions, minimum_support) :
     """
         Generates frequent itemsets from transactional data using the Apriori algorithm.
 
         Parameters:
-        transactions (list): A list of transactions(DB), where each transaction is represented as a list of items.
-        Be aware that each element in a transaction is string (ex. '7')
+        transactions (TransactionDatabase): Transactions(DB), where each transaction is a sequence of
+        ascending, distinct int items (ex. [2, 7, 14])
         minimum_support (float): Minimum support with percentage (ex. 50.0)
         Return:
         list: A list of frequent itemsets discovered from the transactional data.
@@ -20,7 +263,6 @@ def get_frequent_itemset_list(transactions, minimum_support) :
     itemset_count_dict = dict()  # itemset_count_dict = {}
     for transaction in transactions:  # loop the DB to get frequent 1-itemset
         for item in transaction:  # traverse each transaction
-            item = int(item)  # convert string into int type
             itemset = tuple([item])  # transform an integer into a tuple ( 3 -> (3,) )
             if itemset not in itemset_count_dict:  # if the itemset is not found as a key
                 itemset_count_dict[itemset] = 1  # add the key and set the count to 1
@@ -39,6 +281,10 @@ def get_frequent_itemset_list(transactions, minimum_support) :
     # Delete keys in the dictionary that are not frequent.
     for key in keys_to_delete:
         del itemset_count_dict[key]
+    if run_metrics is not None:
+        add_metric('db_scans')
+        add_metric('candidates_counted', len(itemset_count_dict) + len(keys_to_delete), 1)
+        add_metric('frequent_itemsets', len(itemset_count_dict), 1)
     frequent_itemset_list.append(itemset_count_dict)  # frequent_item_list[0] -> size 1 itemset
     # print(frequent_itemset_list[0])
     # K = 1 done (made L_1)
@@ -46,31 +292,7 @@ def get_frequent_itemset_list(transactions, minimum_support) :
     k = 1  # variable for iteration
     while True:
         # Make candidates (C_k+1) generated from L_k
-        candidate_itemsets = set()
-        for itemset_1 in frequent_itemset_list[k - 1]:  # itemset_1 -> ('9',)
-            for itemset_2 in frequent_itemset_list[k - 1]:  # itemset_1 -> ('9',)
-                # change tuple into set
-                itemset_1 = set(itemset_1)
-                itemset_2 = set(itemset_2)
-
-                # union itemset in L_k to make the candidates
-                union_set = itemset_1.union(itemset_2)
-
-                # change the unioned set into a list. (To make it ascendent)
-                union_set_list = sorted(union_set)
-
-                # verify the length, and add into the candidate_itemsets
-                if len(union_set_list) == k + 1:
-                    candidate_itemsets.add(tuple(union_set_list))
-
-        pruned_candidate_itemsets = candidate_itemsets.copy()
-
-        for itemset in candidate_itemsets:  # the item is sorted in ascending order. (ex. (6, 18))
-            # frequent_itemset_list[k-1] == {(7,): 120, (14,): 128, (9,): 139}
-            for itemset_to_delete in keys_to_delete:  # iterating keys_to_delete (ex. (6, ))
-                if set(itemset_to_delete).issubset(set(itemset)):
-                    pruned_candidate_itemsets.discard(
-                        itemset)  # remove the item if its subset is not frequent(apriori algorithm)
+        pruned_candidate_itemsets = generate_candidate_itemsets(frequent_itemset_list[k - 1], k, record_metrics=True)
 
         # print(len(pruned_candidate_itemsets))
 
@@ -79,17 +301,7 @@ def get_frequent_itemset_list(transactions, minimum_support) :
 
         # DB scan (DB: transactions)
         # count the support in DB
-        itemset_count_dict = dict()  # itemset_count_dict = {}
-        for transaction in transactions:  # loop the DB to get frequent 1-itemset
-            transaction_set = set(
-                [int(item) for item in transaction])  # transform the string list into the set of integers
-            for pruned_itemset in pruned_candidate_itemsets:
-                if set(pruned_itemset).issubset(
-                        transaction_set):  # if the pruned_itemset is the subset of transaction (frequency += 1)
-                    if pruned_itemset not in itemset_count_dict:  # if the itemset is not found as a key
-                        itemset_count_dict[pruned_itemset] = 1  # add the key and set the count to 1
-                    else:  # if the itemset is already in the dictionary
-                        itemset_count_dict[pruned_itemset] += 1  # add 1 to the value of the corresponding key
+        itemset_count_dict = count_candidate_itemsets(transactions, pruned_candidate_itemsets)
 
         # Delete not frequent ones!
         # Find the keys that are not frequent, and put them(keys) into the list.
@@ -105,6 +317,7 @@ def get_frequent_itemset_list(transactions, minimum_support) :
         if len(itemset_count_dict) == 0:
             break  # Finish the apriori algorithm
 
+        add_metric('frequent_itemsets', len(itemset_count_dict), k + 1)
         frequent_itemset_list.append(itemset_count_dict)  # frequent_item_list[k] -> size k+1 itemset
         k += 1  # same as i++ in for-loop
     # # for test
@@ -112,6 +325,776 @@ def get_frequent_itemset_list(transactions, minimum_support) :
     #     print(frequent_itemset)
     return frequent_itemset_list  # ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
 
+def build_tid_bitsets(transactions):
+    """
+        Builds the vertical representation of the DB in a single scan.
+        Bit t of an item's bitset is set if the t-th transaction contains the item.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB), where each transaction is a sequence of
+        ascending, distinct int items (ex. [2, 7, 14])
+        Return:
+        dict: A dictionary of size 1 itemset -> bitset (int), in the order each item first appears in the DB.
+        ex) {(7,): 0b10011, (14,): 0b1}
+    """
+    add_metric('db_scans')
+    tid_lists = dict()
+    num_of_transactions = 0
+    for tid, transaction in enumerate(transactions):
+        for item in transaction:
+            itemset = (item,)
+            if itemset not in tid_lists:
+                tid_lists[itemset] = array('i')
+            tid_lists[itemset].append(tid)
+        num_of_transactions = tid + 1
+
+    # Setting bits one by one on a Python int costs O(|DB|) each, so fill a byte buffer first.
+    tid_bitsets = dict()
+    for itemset, tid_list in tid_lists.items():
+        buffer = bytearray((num_of_transactions + 7) // 8)
+        for tid in tid_list:
+            buffer[tid >> 3] |= 1 << (tid & 7)
+        tid_bitsets[itemset] = int.from_bytes(buffer, 'little')
+    return tid_bitsets
+
+def get_support(tid_bitset):
+    """
+        Return the number of transactions in the given bitset (its popcount).
+        int.bit_count is new in Python 3.10, so bin() is counted on older versions.
+    """
+    if hasattr(int, 'bit_count'):
+        return tid_bitset.bit_count()
+    return bin(tid_bitset).count('1')
+
+def get_first_tid(tid_bitset):
+    """
+        Return the index of the first transaction that contains the itemset of the given bitset.
+    """
+    return (tid_bitset & -tid_bitset).bit_length() - 1
+
+def iterate_frequent_levels_vertical(transactions, minimum_support):
+    """
+        Generates frequent itemsets level by level using the Apriori algorithm on the vertical (TID bitset) layout.
+        The DB is scanned only once. The support of a candidate is the popcount of the AND of its two
+        parent itemsets' bitsets, so each level costs O(|C_k| * |DB| / 64) instead of O(|DB| * |C_k|) subset tests.
+        Only the bitsets of the current level are kept.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB), where each transaction is a sequence of
+        ascending, distinct int items (ex. [2, 7, 14])
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        Return:
+        generator: Dictionaries of the frequent itemsets of length 1, 2, ... (L_1 is always generated)
+        ex) {(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}
+    """
+    tid_bitsets = build_tid_bitsets(transactions)  # L_k itemset -> bitset, the only DB scan
+
+    itemset_count_dict = dict()
+    for itemset, tid_bitset in list(tid_bitsets.items()):
+        count = get_support(tid_bitset)
+        if count < minimum_support:
+            del tid_bitsets[itemset]
+        else:
+            itemset_count_dict[itemset] = count
+    yield itemset_count_dict
+
+    k = 1
+    while True:
+        pruned_candidate_itemsets = generate_candidate_itemsets(itemset_count_dict, k, record_metrics=True)
+
+        candidate_bitsets = []  # list of (itemset, bitset) of frequent candidates
+        for itemset in pruned_candidate_itemsets:
+            # Two parents share the prefix itemset[:-2]. (ex. (1, 3, 8) <- (1, 3) & (1, 8))
+            tid_bitset = tid_bitsets[itemset[:-1]] & tid_bitsets[itemset[:-2] + itemset[-1:]]
+            if get_support(tid_bitset) >= minimum_support:
+                candidate_bitsets.append((itemset, tid_bitset))
+
+        if len(candidate_bitsets) == 0:
+            break
+
+        # Keep the order of get_frequent_itemset_list, where an itemset is added when it is first found in the DB.
+        candidate_bitsets.sort(key=lambda pair: get_first_tid(pair[1]))
+        tid_bitsets = dict(candidate_bitsets)  # (k-1)-level bitsets are not needed anymore
+        itemset_count_dict = {itemset: get_support(tid_bitset) for itemset, tid_bitset in candidate_bitsets}
+        yield itemset_count_dict
+        k += 1
+
+def get_frequent_itemset_list_vertical(transactions, minimum_support):
+    """
+        Generates frequent itemsets using the Apriori algorithm on the vertical (TID bitset) layout.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB)
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        Return:
+        list: A list of frequent itemsets, in the same format and order as get_frequent_itemset_list.
+        ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+    """
+    return list(iterate_frequent_levels_vertical(transactions, minimum_support))
+
+def get_condensed_itemset_list(transactions, minimum_support, condensed_type):
+    """
+        Generates only the closed or only the maximal frequent itemsets.
+        An itemset of L_k is decided as soon as L_k+1 is mined, and L_k is dropped after that:
+        it is not maximal if any of its supersets in L_k+1 is frequent,
+        and it is not closed if one of them has the same support.
+        The levels always come from the vertical engine (iterate_frequent_levels_vertical).
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB)
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        condensed_type (str): 'closed' or 'maximal'
+        Return:
+        list: A list of dictionaries, index i has the closed (or maximal) itemsets of length (i+1) with their counts.
+        ex) [{(3,): 150}, {(8, 16): 151}]
+    """
+    condensed_itemset_list = []
+    previous_level = None
+    for level in iterate_frequent_levels_vertical(transactions, minimum_support):
+        if previous_level is not None:
+            not_condensed = set()
+            for itemset, count in level.items():
+                for i in range(len(itemset)):
+                    subset = itemset[:i] + itemset[i + 1:]
+                    if condensed_type == 'maximal' or previous_level[subset] == count:
+                        not_condensed.add(subset)
+            condensed_itemset_list.append({itemset: count for itemset, count in previous_level.items()
+                                           if itemset not in not_condensed})
+        previous_level = level
+    condensed_itemset_list.append(previous_level)  # the longest itemsets have no frequent superset
+    return condensed_itemset_list
+
+class FPNode:
+    """
+        A node of the FP-tree. Nodes of the same item are linked through node_link.
+    """
+    __slots__ = ('item', 'count', 'parent', 'children', 'node_link')
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = dict()  # item -> FPNode
+        self.node_link = None  # next node which has the same item
+
+def build_fp_tree(transactions, minimum_support, counts=None):
+    """
+        Builds an FP-tree with two passes over the given transactions.
+
+        Parameters:
+        transactions (TransactionDatabase or list): Transactions(DB) or the prefix paths of a conditional pattern base.
+        Items of each transaction are distinct int items.
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        counts (list): Weight of each transaction. Every transaction counts 1 if it is None.
+        Return:
+        dict: The header table. frequent item -> [support, first node of the item]
+    """
+    if counts is None:  # the DB itself, not a conditional pattern base
+        add_metric('db_scans', 2)
+    # 1st pass: count each item
+    item_count_dict = dict()
+    for i, transaction in enumerate(transactions):
+        count = 1 if counts is None else counts[i]
+        for item in transaction:
+            item_count_dict[item] = item_count_dict.get(item, 0) + count
+
+    header_table = {item: [count, None] for item, count in item_count_dict.items() if count >= minimum_support}
+
+    # 2nd pass: insert the frequent items of each transaction in descending order of the support
+    root = FPNode(None, None)
+    for i, transaction in enumerate(transactions):
+        count = 1 if counts is None else counts[i]
+        items = [item for item in transaction if item in header_table]
+        items.sort(key=lambda item: (-header_table[item][0], item))
+        node = root
+        for item in items:
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                child.node_link = header_table[item][1]  # push front into the node-link list of the item
+                header_table[item][1] = child
+            child.count += count
+            node = child
+    return header_table
+
+def mine_fp_tree(header_table, minimum_support, suffix, itemset_count_dict):
+    """
+        Mines the FP-tree recursively through the conditional pattern base of each item.
+
+        Parameters:
+        header_table (dict): The header table of the FP-tree (from build_fp_tree)
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        suffix (tuple): Items which the FP-tree is conditioned on. () for the whole DB.
+        itemset_count_dict (dict): Found frequent itemsets are added here. ex) {(8, 16): 151}
+    """
+    for item, (support, node) in header_table.items():
+        itemset = tuple(sorted(suffix + (item,)))
+        itemset_count_dict[itemset] = support
+
+        # conditional pattern base: prefix paths of every node of the item
+        prefix_paths = []
+        path_counts = []
+        while node is not None:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                prefix_paths.append(path)
+                path_counts.append(node.count)
+            node = node.node_link
+
+        conditional_header_table = build_fp_tree(prefix_paths, minimum_support, path_counts)
+        if conditional_header_table:
+            mine_fp_tree(conditional_header_table, minimum_support, suffix + (item,), itemset_count_dict)
+
+def get_frequent_itemset_list_fp_growth(transactions, minimum_support):
+    """
+        Generates frequent itemsets using the FP-Growth algorithm.
+        Only two DB scans are needed and no candidate itemset is generated.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB), where each transaction is a sequence of
+        ascending, distinct int items (ex. [2, 7, 14])
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        Return:
+        list: A list of frequent itemsets, in the same format as get_frequent_itemset_list.
+        Itemsets of each length are sorted in ascending order.
+        ex) [{(3,): 150, (8,): 226, (16,): 212}, {(8, 16): 151}]
+    """
+    itemset_count_dict = dict()
+    mine_fp_tree(build_fp_tree(transactions, minimum_support), minimum_support, (), itemset_count_dict)
+
+    frequent_itemset_list = []
+    for itemset in sorted(itemset_count_dict, key=lambda itemset: (len(itemset), itemset)):
+        if len(itemset) > len(frequent_itemset_list):
+            frequent_itemset_list.append(dict())
+        frequent_itemset_list[len(itemset) - 1][itemset] = itemset_count_dict[itemset]
+    if not frequent_itemset_list:  # same as Apriori, L_1 is always in the list
+        frequent_itemset_list.append(dict())
+    return frequent_itemset_list
+
+# engine name -> function, selected with "--engine" option
+MINING_ENGINES = {
+    'apriori': get_frequent_itemset_list,
+    'vertical': get_frequent_itemset_list_vertical,
+    'fp-growth': get_frequent_itemset_list_fp_growth,
+}
+
+def mine_local_itemsets(shard, minimum_support_ratio, engine_name, record_metrics=False):
+    """
+        1st phase of SON. Mines the itemsets which are frequent in one shard of the DB.
+
+        Parameters:
+        shard (TransactionDatabase): A part of the transactions(DB)
+        minimum_support_ratio (float): Minimum support as a ratio of the number of transactions (ex. 0.1)
+        engine_name (str): Name of the engine in MINING_ENGINES used for the shard
+        record_metrics (bool): Whether the counters of the worker are recorded
+        Return:
+        list: A list of sets of the locally frequent itemsets, index i has itemsets of length (i+1).
+        dict: The counters of the worker if record_metrics is True, otherwise None.
+        (The frequent itemsets of the shard are counted as local_frequent_itemsets.)
+    """
+    global run_metrics
+    run_metrics = {'phases': dict(), 'counters': dict()} if record_metrics else None
+    # a globally frequent itemset reaches the scaled threshold in at least one shard,
+    # so the rounding error of the scaled threshold must not make it a little larger.
+    local_minimum_support = minimum_support_ratio * len(shard) * (1 - 1e-9)
+    local_itemsets_list = [set(itemset_count_dict) for itemset_count_dict
+                           in MINING_ENGINES[engine_name](shard, local_minimum_support)]
+    if run_metrics is not None and 'frequent_itemsets' in run_metrics['counters']:
+        run_metrics['counters']['local_frequent_itemsets'] = run_metrics['counters'].pop('frequent_itemsets')
+    return local_itemsets_list, run_metrics and run_metrics['counters']
+
+def count_shard_itemsets(shard, candidate_itemsets_list, record_metrics=False):
+    """
+        2nd phase of SON. Counts every candidate itemset in one shard of the DB.
+
+        Parameters:
+        shard (TransactionDatabase): A part of the transactions(DB)
+        candidate_itemsets_list (list): index i has a sorted list of the candidate itemsets of length (i+1)
+        record_metrics (bool): Whether the counters of the worker are recorded
+        Return:
+        list: A list of dictionaries of itemset -> count in the shard.
+        dict: The counters of the worker if record_metrics is True, otherwise None.
+    """
+    global run_metrics
+    run_metrics = {'phases': dict(), 'counters': dict()} if record_metrics else None
+    shard_count_list = [count_candidate_itemsets(shard, candidate_itemsets) for candidate_itemsets in candidate_itemsets_list]
+    return shard_count_list, run_metrics and run_metrics['counters']
+
+def get_frequent_itemset_list_son(transactions, minimum_support, workers, engine_name='apriori'):
+    """
+        Generates frequent itemsets with the SON (Savasere, Omiecinski and Navathe) partition algorithm.
+        The DB is divided into one shard per worker. Each worker process mines its shard with the scaled
+        minimum support, then the union of the local results is counted over every shard in parallel.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB)
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        workers (int): Number of worker processes
+        engine_name (str): Name of the engine in MINING_ENGINES used for each shard
+        Return:
+        list: A list of frequent itemsets, in the same format and order as get_frequent_itemset_list.
+    """
+    num_of_transactions = len(transactions)
+    if num_of_transactions == 0:
+        return [dict()]
+    shard_bounds = [num_of_transactions * i // workers for i in range(workers + 1)]
+    shards = [transactions.get_shard(start, end) for start, end in zip(shard_bounds, shard_bounds[1:]) if start < end]
+    minimum_support_ratio = minimum_support / num_of_transactions
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        candidate_itemsets_list = []  # union of the local frequent itemsets
+        record_metrics = [run_metrics is not None] * len(shards)
+        for local_itemsets_list, counters in executor.map(mine_local_itemsets, shards, [minimum_support_ratio] * len(shards),
+                                                          [engine_name] * len(shards), record_metrics):
+            if counters is not None:
+                merge_metrics(counters)
+            for i, local_itemsets in enumerate(local_itemsets_list):
+                if i == len(candidate_itemsets_list):
+                    candidate_itemsets_list.append(set())
+                candidate_itemsets_list[i].update(local_itemsets)
+        candidate_itemsets_list = [sorted(candidate_itemsets) for candidate_itemsets in candidate_itemsets_list]
+
+        # merge the shard counts in the order of the shards, so itemsets keep the order they are first found in the DB
+        frequent_itemset_list = [dict() for _ in candidate_itemsets_list]
+        for shard_count_list, counters in executor.map(count_shard_itemsets, shards,
+                                                       [candidate_itemsets_list] * len(shards), record_metrics):
+            if counters is not None:
+                merge_metrics(counters)
+            for itemset_count_dict, shard_count_dict in zip(frequent_itemset_list, shard_count_list):
+                for itemset, count in shard_count_dict.items():
+                    itemset_count_dict[itemset] = itemset_count_dict.get(itemset, 0) + count
+
+    frequent_itemset_list = [{itemset: count for itemset, count in itemset_count_dict.items() if count >= minimum_support}
+                             for itemset_count_dict in frequent_itemset_list]
+    while len(frequent_itemset_list) > 1 and len(frequent_itemset_list[-1]) == 0:
+        frequent_itemset_list.pop()
+    if run_metrics is not None:
+        for length, itemset_count_dict in enumerate(frequent_itemset_list, start=1):
+            add_metric('frequent_itemsets', len(itemset_count_dict), length)
+    return frequent_itemset_list or [dict()]
+
+def mine_frequent_itemsets(transactions, minimum_support, engine_name, workers=1):
+    """
+        Generates frequent itemsets with the given engine, partitioned over worker processes if workers > 1.
+    """
+    if workers > 1:
+        return get_frequent_itemset_list_son(transactions, minimum_support, workers, engine_name)
+    return MINING_ENGINES[engine_name](transactions, minimum_support)
+
+def cross_check_engines(transactions, minimum_support, engine_names, workers=1):
+    """
+        Runs every given engine and checks that all of them find the same itemsets with the same counts.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB)
+        minimum_support (float): Minimum support with counts (ex. 50.0)
+        engine_names (list): Names of the engines in MINING_ENGINES. ex) ['apriori', 'fp-growth']
+        workers (int): Number of worker processes for the first engine
+        Return:
+        list: The frequent itemset list found by the first engine.
+    """
+    results = [mine_frequent_itemsets(transactions, minimum_support, engine_names[0], workers)]
+    results += [MINING_ENGINES[engine_name](transactions, minimum_support) for engine_name in engine_names[1:]]
+    for engine_name, result in zip(engine_names[1:], results[1:]):
+        for length in range(1, max(len(results[0]), len(result)) + 1):
+            expected = results[0][length - 1] if length <= len(results[0]) else dict()
+            found = result[length - 1] if length <= len(result) else dict()
+            if expected != found:
+                raise AssertionError("%s and %s found different %d-itemsets (%d vs %d itemsets)"
+                                     % (engine_names[0], engine_name, length, len(expected), len(found)))
+    return results[0]
+
+def count_itemsets(transactions_list, itemsets):
+    """
+        Counts the support of itemsets of any length, with one scan of each DB per length.
+
+        Parameters:
+        transactions_list (list): TransactionDatabases to scan. ex) [old DB, delta DB]
+        itemsets (iterable): Ascending tuples. ex) [(3,), (1, 8), (3, 8, 16)]
+        Return:
+        dict: itemset -> count, including the itemsets which are not found (count 0).
+    """
+    itemsets_by_length = dict()
+    for itemset in itemsets:
+        itemsets_by_length.setdefault(len(itemset), []).append(itemset)
+    itemset_count_dict = dict()
+    for candidate_itemsets in itemsets_by_length.values():
+        for itemset in candidate_itemsets:
+            itemset_count_dict[itemset] = 0
+        for transactions in transactions_list:
+            count_candidate_itemsets(transactions, candidate_itemsets, itemset_count_dict)
+    return itemset_count_dict
+
+def get_negative_border(frequent_itemset_list):
+    """
+        Return the negative border of length 2 or more: candidates generated from L_k which are not in L_k+1.
+        (Infrequent items are the negative border of length 1.)
+
+        Parameters:
+        frequent_itemset_list (list): A list of frequent itemsets. ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+        Return:
+        list: A list of the itemsets in the negative border. ex) [(3, 8), (3, 16)]
+    """
+    negative_border = []
+    for k, itemset_count_dict in enumerate(frequent_itemset_list, start=1):
+        next_level = frequent_itemset_list[k] if k < len(frequent_itemset_list) else dict()
+        negative_border += [itemset for itemset in generate_candidate_itemsets(itemset_count_dict, k)
+                            if itemset not in next_level]
+    return negative_border
+
+def build_incremental_state(transactions, frequent_itemset_list, minimum_support_percentage, input_file_name):
+    """
+        Makes the state of a full run for the later incremental updates.
+        Every item and every itemset of the negative border is counted with their exact support.
+
+        Parameters:
+        transactions (TransactionDatabase): Transactions(DB)
+        frequent_itemset_list (list): A list of frequent itemsets of the transactions
+        minimum_support_percentage (float): Minimum support with percentage (ex. 5.0)
+        input_file_name (str): Name of the input file of the transactions
+        Return:
+        dict: The state. (see save_incremental_state)
+    """
+    item_count_dict = dict()
+    for transaction in transactions:
+        for item in transaction:
+            item_count_dict[(item,)] = item_count_dict.get((item,), 0) + 1
+    negative_border = {itemset: count for itemset, count in item_count_dict.items()
+                       if itemset not in frequent_itemset_list[0]}
+    negative_border.update(count_itemsets([transactions], get_negative_border(frequent_itemset_list)))
+    return {
+        'minimum_support': minimum_support_percentage,
+        'num_of_transactions': len(transactions),
+        'data_files': [input_file_name],
+        'frequent': {itemset: count for itemset_count_dict in frequent_itemset_list
+                     for itemset, count in itemset_count_dict.items()},
+        'negative_border': negative_border,
+    }
+
+def update_incremental_state(state, delta_transactions, delta_file_name):
+    """
+        Updates the frequent itemsets with an appended batch of transactions, in the way of FUP (Fast UPdate).
+        Supports of the known itemsets (frequent or in the negative border) are updated by scanning only the delta.
+        A new candidate is counted in the old data only if it is frequent within the delta,
+        because an itemset which is infrequent both in the old data and in the delta can not be frequent.
+
+        Parameters:
+        state (dict): The state of the previous run. It is updated in place.
+        delta_transactions (TransactionDatabase): Appended transactions
+        delta_file_name (str): Name of the file of the appended transactions
+        Return:
+        list: A list of frequent itemsets of the whole data. Itemsets of each length are sorted in ascending order.
+    """
+    old_itemset_count_dict = dict(state['frequent'])
+    old_itemset_count_dict.update(state['negative_border'])
+    num_of_delta_transactions = len(delta_transactions)
+    num_of_transactions = state['num_of_transactions'] + num_of_delta_transactions
+    minimum_support = state['minimum_support'] / 100 * num_of_transactions
+    minimum_delta_support = state['minimum_support'] / 100 * num_of_delta_transactions
+
+    delta_count_dict = count_itemsets([delta_transactions], old_itemset_count_dict)
+    # every item of the old data is known, so an unknown item has never appeared before
+    new_item_count_dict = dict()
+    for transaction in delta_transactions:
+        for item in transaction:
+            if (item,) not in old_itemset_count_dict:
+                new_item_count_dict[(item,)] = new_item_count_dict.get((item,), 0) + 1
+    for itemset, count in new_item_count_dict.items():
+        old_itemset_count_dict[itemset] = 0
+        delta_count_dict[itemset] = count
+
+    frequent_itemset_list = []
+    negative_border = dict()
+    candidate_count_dict = {itemset: old_itemset_count_dict[itemset] + delta_count
+                            for itemset, delta_count in delta_count_dict.items() if len(itemset) == 1}
+    k = 1
+    while candidate_count_dict:
+        itemset_count_dict = dict()
+        for itemset in sorted(candidate_count_dict):
+            if candidate_count_dict[itemset] >= minimum_support:
+                itemset_count_dict[itemset] = candidate_count_dict[itemset]
+            else:
+                negative_border[itemset] = candidate_count_dict[itemset]
+        if len(itemset_count_dict) == 0:
+            break
+        frequent_itemset_list.append(itemset_count_dict)
+
+        # C_k+1: known candidates take the updated counts, new ones are checked in the delta first
+        candidate_count_dict = dict()
+        new_candidate_itemsets = []
+        for itemset in generate_candidate_itemsets(itemset_count_dict, k):
+            if itemset in old_itemset_count_dict:
+                candidate_count_dict[itemset] = old_itemset_count_dict[itemset] + delta_count_dict[itemset]
+            else:
+                new_candidate_itemsets.append(itemset)
+        if new_candidate_itemsets:
+            new_delta_count_dict = count_itemsets([delta_transactions], new_candidate_itemsets)
+            # the others stay unknown, which means they are not frequent in the data so far
+            rescan_itemsets = [itemset for itemset in new_candidate_itemsets
+                               if new_delta_count_dict[itemset] >= minimum_delta_support]
+            if rescan_itemsets:
+                old_transactions_list = [load_transactions(data_file) for data_file in state['data_files']]
+                old_count_dict = count_itemsets(old_transactions_list, rescan_itemsets)
+                for itemset in rescan_itemsets:
+                    candidate_count_dict[itemset] = old_count_dict[itemset] + new_delta_count_dict[itemset]
+        k += 1
+
+    state['num_of_transactions'] = num_of_transactions
+    state['data_files'].append(delta_file_name)
+    state['frequent'] = {itemset: count for itemset_count_dict in frequent_itemset_list
+                         for itemset, count in itemset_count_dict.items()}
+    state['negative_border'] = negative_border
+    return frequent_itemset_list or [dict()]
+
+def save_incremental_state(state, state_file_name):
+    """
+        Saves the state into a JSON file.
+        ex) {"minimum_support": 5.0, "num_of_transactions": 500, "data_files": ["input.txt"],
+             "frequent": [[[8, 16], 151], ...], "negative_border": [[[3, 8], 12], ...]}
+    """
+    with open(state_file_name, 'w') as file:
+        json.dump({
+            'minimum_support': state['minimum_support'],
+            'num_of_transactions': state['num_of_transactions'],
+            'data_files': state['data_files'],
+            'frequent': [[list(itemset), count] for itemset, count in state['frequent'].items()],
+            'negative_border': [[list(itemset), count] for itemset, count in state['negative_border'].items()],
+        }, file)
+
+def load_incremental_state(state_file_name):
+    """
+        Loads the state saved by save_incremental_state.
+    """
+    with open(state_file_name, 'r') as file:
+        state = json.load(file)
+    state['frequent'] = {tuple(itemset): count for itemset, count in state['frequent']}
+    state['negative_border'] = {tuple(itemset): count for itemset, count in state['negative_border']}
+    return state
+
+def sample_transactions(input_file_name, sample_size, seed=0):
+    """
+        Draws a uniform random sample of the transactions with one pass over the input file (reservoir sampling).
+        Only the sampled lines are encoded, so the memory is bounded by the sample size.
+
+        Parameters:
+        input_file_name (str): Name of the input file
+        sample_size (int): Number of transactions to sample
+        seed (int): Random seed
+        Return:
+        TransactionDatabase: The sampled transactions.
+        int: Number of transactions of the input file.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    add_metric('db_scans')
+    num_of_transactions = 0
+    with open(input_file_name, 'r') as file:
+        for num_of_transactions, line in enumerate(file, start=1):
+            if num_of_transactions <= sample_size:
+                reservoir.append(line)
+            else:
+                j = rng.randrange(num_of_transactions)
+                if j < sample_size:
+                    reservoir[j] = line
+    offsets = array('q', [0])
+    items = array('i')
+    for line in reservoir:
+        items.extend(sorted(set(int(item) for item in line.split())))
+        offsets.append(len(items))
+    return TransactionDatabase(offsets, items), num_of_transactions
+
+def mine_sample(sample, minimum_support):
+    """
+        Runs Apriori on a sample in memory. Its scans are counted as sample_scans, so db_scans stays
+        the number of passes over the input file.
+
+        Parameters:
+        sample (TransactionDatabase): The sampled transactions
+        minimum_support (float): Minimum support with counts in the sample (ex. 5.0)
+        Return:
+        list: A list of frequent itemsets of the sample, in the same format as get_frequent_itemset_list.
+    """
+    if run_metrics is None:
+        return get_frequent_itemset_list(sample, minimum_support)
+    db_scans = run_metrics['counters'].get('db_scans', 0)
+    sample_itemset_list = get_frequent_itemset_list(sample, minimum_support)
+    add_metric('sample_scans', run_metrics['counters'].get('db_scans', 0) - db_scans)
+    run_metrics['counters']['db_scans'] = db_scans
+    return sample_itemset_list
+
+def iterate_transactions(input_file_name):
+    """
+        Yields the transactions of the input file one by one as ascending, distinct int items, without keeping them.
+    """
+    with open(input_file_name, 'r') as file:
+        for line in file:
+            yield sorted(set(int(item) for item in line.split()))
+
+def count_itemsets_one_pass(transactions, itemsets):
+    """
+        Counts the support of itemsets of any length, and of every single item, with one DB scan.
+        The itemsets are put into one trie where an itemset ends at its own node (key None),
+        and each transaction walks the trie along its items.
+
+        Parameters:
+        transactions (iterable): Transactions of ascending, distinct int items
+        itemsets (iterable): Ascending tuples of length 2 or more. ex) [(1, 8), (3, 8, 16)]
+        Return:
+        dict: item -> count, in the order the items are first found.
+        dict: itemset -> count, for the itemsets found at least once, in the order they are first found.
+    """
+    root = dict()
+    for itemset in itemsets:
+        node = root
+        for item in itemset:
+            node = node.setdefault(item, dict())
+        node[None] = itemset
+    item_count_dict = dict()
+    itemset_count_dict = dict()
+    add_metric('db_scans')
+
+    def visit(node, items, start):
+        for i in range(start, len(items)):
+            child = node.get(items[i])
+            if child is None:
+                continue
+            itemset = child.get(None)
+            if itemset is not None:
+                itemset_count_dict[itemset] = itemset_count_dict.get(itemset, 0) + 1
+            if len(child) > (itemset is not None):
+                visit(child, items, i + 1)
+
+    for transaction in transactions:
+        for item in transaction:
+            item_count_dict[item] = item_count_dict.get(item, 0) + 1
+        if root:
+            visit(root, transaction, 0)
+    return item_count_dict, itemset_count_dict
+
+def get_extended_negative_border(frequent_itemset_list, counted_itemsets):
+    """
+        Return the itemsets which may be frequent but were not counted yet: the candidates generated level by level
+        from the frequent itemsets, as if every candidate which was not counted were frequent.
+        Every frequent itemset is either counted or in the result, so one more pass makes the result exact.
+
+        Parameters:
+        frequent_itemset_list (list): A list of the counted frequent itemsets (every item is counted).
+        ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+        counted_itemsets (set): Itemsets of length 2 or more which were counted. ex) {(3, 8), (3, 16), (8, 16)}
+        Return:
+        list: A list of the itemsets to count. ex) [(3, 8, 16)]
+    """
+    extended_negative_border = []
+    level = frequent_itemset_list[0]
+    k = 1
+    while level:
+        next_level = dict(frequent_itemset_list[k]) if k < len(frequent_itemset_list) else dict()
+        for itemset in generate_candidate_itemsets(level, k):
+            if itemset not in counted_itemsets:
+                extended_negative_border.append(itemset)
+                next_level[itemset] = 0  # not counted, so possibly frequent
+        level = next_level
+        k += 1
+    return extended_negative_border
+
+def get_frequent_itemset_list_toivonen(input_file_name, minimum_support_percentage, sample_size, lowering=0.8,
+                                       seed=0, max_attempts=3, max_extended_border=100000):
+    """
+        Finds the exact frequent itemsets with the sampling algorithm of Toivonen.
+        Apriori runs on a random sample in memory with a lowered threshold, and the frequent itemsets of the sample
+        and their negative border are verified with one full pass over the input file.
+        If an itemset of the negative border is frequent, some frequent itemsets may be missing,
+        so the extended negative border (every itemset which may still be frequent) is counted with one more pass.
+        If it is larger than max_extended_border, a new sample is tried with the threshold lowered again.
+        (After max_attempts, the whole data is mined.)
+
+        Parameters:
+        input_file_name (str): Name of the input file
+        minimum_support_percentage (float): Minimum support with percentage (ex. 5.0)
+        sample_size (int): Number of transactions in the sample
+        lowering (float): The threshold in the sample is (minimum support * lowering), and (lowering ** 2) in the second
+                          sample and so on
+        seed (int): Random seed of the first sample
+        max_attempts (int): Number of samples to try
+        max_extended_border (int): Largest extended negative border to count instead of trying a new sample
+        Return:
+        list: A list of frequent itemsets of the whole data. ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+        int: Number of transactions of the input file.
+    """
+    for attempt in range(max_attempts):
+        sample, num_of_transactions = sample_transactions(input_file_name, sample_size, seed + attempt)
+        sample_itemset_list = mine_sample(
+            sample, minimum_support_percentage / 100 * len(sample) * lowering ** (attempt + 1))
+        sample_itemsets = [itemset for itemset_count_dict in sample_itemset_list[1:] for itemset in itemset_count_dict]
+        negative_border = get_negative_border(sample_itemset_list)
+
+        item_count_dict, itemset_count_dict = count_itemsets_one_pass(iterate_transactions(input_file_name),
+                                                                      sample_itemsets + negative_border)
+        minimum_support = minimum_support_percentage / 100 * num_of_transactions
+        # the negative border of length 1 is every item which is not frequent in the sample
+        missed_itemsets = [(item,) for item, count in item_count_dict.items()
+                           if count >= minimum_support and (item,) not in sample_itemset_list[0]]
+        missed_itemsets += [itemset for itemset in negative_border if itemset_count_dict.get(itemset, 0) >= minimum_support]
+
+        frequent_itemset_list = [{(item,): count for item, count in item_count_dict.items() if count >= minimum_support}]
+        for itemset, count in itemset_count_dict.items():
+            if count >= minimum_support:
+                while len(frequent_itemset_list) < len(itemset):
+                    frequent_itemset_list.append(dict())
+                frequent_itemset_list[len(itemset) - 1][itemset] = count
+        if not missed_itemsets:
+            return frequent_itemset_list, num_of_transactions
+
+        extended_negative_border = get_extended_negative_border(frequent_itemset_list,
+                                                                set(sample_itemsets + negative_border))
+        if len(extended_negative_border) > max_extended_border:
+            print("Toivonen: %d itemsets of the negative border are frequent (ex. %s) in sample %d, "
+                  "and the extended negative border has %d itemsets, sampling again with a lower threshold"
+                  % (len(missed_itemsets), missed_itemsets[0], attempt + 1, len(extended_negative_border)),
+                  file=sys.stderr)
+            continue
+        print("Toivonen: %d itemsets of the negative border are frequent (ex. %s) in sample %d, "
+              "counting the extended negative border of %d itemsets"
+              % (len(missed_itemsets), missed_itemsets[0], attempt + 1, len(extended_negative_border)), file=sys.stderr)
+        _, itemset_count_dict = count_itemsets_one_pass(iterate_transactions(input_file_name), extended_negative_border)
+        for itemset, count in itemset_count_dict.items():
+            if count >= minimum_support:
+                while len(frequent_itemset_list) < len(itemset):
+                    frequent_itemset_list.append(dict())
+                frequent_itemset_list[len(itemset) - 1][itemset] = count
+        return frequent_itemset_list, num_of_transactions
+
+    print("Toivonen: no sample was verified in %d attempts, mining the whole data" % max_attempts, file=sys.stderr)
+    transactions = read_transactions(input_file_name)
+    return get_frequent_itemset_list(transactions, minimum_support_percentage / 100 * len(transactions)), len(transactions)
+
+def get_frequent_itemset_list_approximate(input_file_name, minimum_support_percentage, sample_size, seed=0, delta=0.05):
+    """
+        Finds the frequent itemsets of a random sample only, without a full pass for the counts.
+        By the Hoeffding bound, the support of each itemset in the sample is within the reported error
+        of its support in the whole data with probability (1 - delta).
+
+        Parameters:
+        input_file_name (str): Name of the input file
+        minimum_support_percentage (float): Minimum support with percentage (ex. 5.0)
+        sample_size (int): Number of transactions in the sample
+        seed (int): Random seed
+        delta (float): Probability that the error bound of an itemset does not hold
+        Return:
+        list: A list of frequent itemsets of the sample, counted in the sample.
+        int: Number of transactions in the sample.
+    """
+    sample, num_of_transactions = sample_transactions(input_file_name, sample_size, seed)
+    error = math.sqrt(math.log(2 / delta) / (2 * len(sample))) * 100 if len(sample) < num_of_transactions else 0.0
+    print("Approximate: supports from %d of %d transactions, within +-%.2f%% with probability %.2f"
+          % (len(sample), num_of_transactions, error, 1 - delta), file=sys.stderr)
+    return mine_sample(sample, minimum_support_percentage / 100 * len(sample)), len(sample)
+
 def divide_into_two_subsets(itemset_tuple):
     """
     Divide a tuple into all possible two disjoint subsets.
@@ -176,50 +1159,224 @@ def get_association_rules_list(frequent_itemset_list, transactions_length):
 
 
 
-if __name__ == '__main__':
-    # Argument num checking
-    if len(sys.argv) != 4:
-        print("<ERROR> Please input three arguments!")
-        sys.exit()
-    minimum_support_str = sys.argv[1]  # 10(%)
-    input_file_name = sys.argv[2]  # input.txt
-    output_file_name = sys.argv[3]  # output.txt
+def generate_association_rules(frequent_itemset_list, transactions_length, minimum_confidence=0.0):
+    """
+        Generates the association rules one by one, whose confidence is at least minimum_confidence.
+        For each itemset, consequents grow level by level like Apriori: if X -> Y fails, X - {i} -> Y + {i}
+        fails too, so a consequent of length m+1 is tried only if all of its subsets of length m passed.
 
-    # Open the file to read
-    with open(input_file_name, 'r') as file:
-        # Initialize empty list to store transactions
-        transactions = []
+        Parameters:
+            frequent_itemset_list (list): A list of frequent itemsets discovered from the transactional data.
+                ex) [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+            transactions_length (int): A number of transactions of the input file.
+            minimum_confidence (float): Minimum confidence with percentage (ex. 50.0)
+        Return:
+            generator: Rules in the same order and format as get_association_rules_list. ex) [(2,), (4,), 8.6, 32.58]
+    """
+    for i in range(1, len(frequent_itemset_list)):  # start from 1 to start from length-2 itemsets
+        for itemset, support in frequent_itemset_list[i].items():
+            rules = []
+            consequents = [(item,) for item in itemset]
+            m = 1  # length of the consequents
+            while consequents and m < len(itemset):
+                passed_consequents = dict()
+                for consequent in consequents:
+                    antecedent = tuple(item for item in itemset if item not in consequent)
+                    confidence = (support / frequent_itemset_list[len(antecedent) - 1][antecedent]) * 100
+                    if confidence >= minimum_confidence:
+                        passed_consequents[consequent] = confidence
+                        rules.append((antecedent, consequent, confidence))
+                consequents = generate_candidate_itemsets(passed_consequents, m)
+                m += 1
 
-        # Iterate over each line to read each transaction(item_id's)
-        for line in file:
-            # Split the line into item IDs with ('\t') as a delimiter
-            item_ids = line.strip().split('\t')
-            # Add each transaction into the list "transactions"
-            transactions.append(item_ids)
+            # same order as divide_into_two_subsets: shorter antecedents first, then in ascending order
+            rules.sort(key=lambda rule: (len(rule[0]), rule[0]))
+            support_percentage = round((support / transactions_length) * 100, 2)
+            for antecedent, consequent, confidence in rules:
+                yield [antecedent, consequent, support_percentage, round(confidence, 2)]
 
-    # number of transactions (used to calculate minimum support)
-    num_of_transactions = len(transactions)
+def write_association_rules(association_rules, output_file_name, buffer_size=8192):
+    """
+        Writes the association rules into the output file, buffer_size rows at a time.
 
-    # minimum support (counts) -> 500 * 10% = 50.0
-    minimum_support = float(minimum_support_str) / 100 * num_of_transactions   # minimum support input can be a float type
+        Parameters:
+            association_rules (iterable): Rows like [(2,), (4,), 8.6, 32.58]
+            output_file_name (str): Name of the output file. ex) "output.txt"
+            buffer_size (int): Number of rows formatted before each write
+    """
+    with open(output_file_name, 'w') as file:
+        lines = []
+        for row in association_rules:
+            lines.append("{%s}\t{%s}\t%.2f\t%.2f\n" % (",".join(map(str, row[0])), ",".join(map(str, row[1])),
+                                                        row[2], row[3]))
+            if len(lines) >= buffer_size:
+                add_metric('rules', len(lines))
+                file.writelines(lines)
+                lines.clear()
+        add_metric('rules', len(lines))
+        file.writelines(lines)
 
-    # 'transactions' variable is now such like [['7', '14'], ['9'], ['18', '2', '4', '5', '1']]
-    # get frequent itemset list using apriori algorithm. Index 0 refers to L_1
-    frequent_itemset_list = get_frequent_itemset_list(transactions, minimum_support)  # frequent_itemset_list == [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
-    # print(frequent_itemset_list)
-    # find association rules for each frequent itemset, and put it into the list.
-    association_rules_list = get_association_rules_list(frequent_itemset_list, num_of_transactions)
+def write_frequent_itemsets(frequent_itemset_list, transactions_length, output_file_name):
+    """
+        Writes each frequent itemset with its support (%) into the output file. ex) {8,16}	30.20
 
-    # Open the file to write
+        Parameters:
+            frequent_itemset_list (list): A list of frequent itemsets. ex) [{(16,): 212}, {(8, 16): 151}]
+            transactions_length (int): A number of transactions of the input file.
+            output_file_name (str): Name of the output file. ex) "output.txt"
+    """
     with open(output_file_name, 'w') as file:
-        for row in association_rules_list:  # iterate over rows
-            file.write("{" + ",".join(str(item) for item in row[0]) + "}\t")  # item_set
-            file.write("{" + ",".join(str(item) for item in row[1]) + "}\t")  # associative_item_set
-            file.write("%.2f\t" %row[2])  # support
-            file.write("%.2f\n" %row[3])  # confidence
+        for itemset_count_dict in frequent_itemset_list:
+            file.writelines("{%s}\t%.2f\n" % (",".join(map(str, itemset)), round((count / transactions_length) * 100, 2))
+                            for itemset, count in itemset_count_dict.items())
+
+OPTION_NAMES = ('engine', 'cross-check', 'workers', 'condensed', 'sample', 'sample-mode', 'sample-lowering', 'seed',
+                'state', 'cache', 'min-conf', 'metrics')
+
+def parse_arguments(argv):
+    """
+        Separate the command line arguments into positional arguments and options.
+        An unknown option, or an option without a value, is reported and exits.
+
+        Parameters:
+            argv (list): Command line arguments without the program name.
+                ex) ['10', 'input.txt', 'output.txt', '--engine', 'vertical']
+        Return:
+            list: Positional arguments. ex) ['10', 'input.txt', 'output.txt']
+            dict: Options without the leading '--'. ex) {'engine': 'vertical'}
+    """
+    positional_arguments = []
+    options = dict()
+    i = 0
+    while i < len(argv):
+        if argv[i].startswith('--'):
+            if argv[i][2:] not in OPTION_NAMES:
+                print("<ERROR> Unknown option %s! (choose from %s)"
+                      % (argv[i], ", ".join('--' + option for option in OPTION_NAMES)))
+                sys.exit(1)
+            if i + 1 >= len(argv):
+                print("<ERROR> Option %s needs a value!" % argv[i])
+                sys.exit(1)
+            options[argv[i][2:]] = argv[i + 1]
+            i += 2
+        else:
+            positional_arguments.append(argv[i])
+            i += 1
+    return positional_arguments, options
+
 
 
+if __name__ == '__main__':
+    positional_arguments, options = parse_arguments(sys.argv[1:])
+    # Argument num checking
+    if len(positional_arguments) != 3:
+        print("<ERROR> Please input three arguments!")
+        sys.exit(1)
+    minimum_support_str = positional_arguments[0]  # 10(%)
+    input_file_name = positional_arguments[1]  # input.txt
+    output_file_name = positional_arguments[2]  # output.txt
+    engine_name = options.get('engine', 'apriori')  # apriori, vertical or fp-growth
+    engine_names = [engine_name]
+    if 'cross-check' in options:  # ex) --cross-check apriori,vertical
+        engine_names += options['cross-check'].split(',')
+    for name in engine_names:
+        if name not in MINING_ENGINES:
+            print("<ERROR> Unknown engine %s! (choose from %s)" % (name, ", ".join(MINING_ENGINES)))
+            sys.exit(1)
+    workers = int(options.get('workers', 1))  # number of processes for the SON partition algorithm
+    condensed_type = options.get('condensed')  # closed or maximal
+    if condensed_type not in (None, 'closed', 'maximal'):
+        print("<ERROR> Condensed type should be closed or maximal!")
+        sys.exit(1)
+    if condensed_type is not None and ('engine' in options or 'workers' in options or len(engine_names) > 1):
+        # condensed itemsets are always mined level by level with the vertical engine
+        print("<ERROR> Condensed itemsets can not be used with --engine, --workers or --cross-check!")
+        sys.exit(1)
+    if condensed_type is not None and 'state' in options:
+        # the state would count the whole history, but condensed itemsets are mined from the input only
+        print("<ERROR> Condensed itemsets can not be used with --state!")
+        sys.exit(1)
+    sample_size = options.get('sample')  # number of sampled transactions for the sampling mode
+    sample_mode = options.get('sample-mode', 'exact')  # exact (Toivonen) or approximate (the sample only)
+    if sample_size is not None and (condensed_type is not None or 'state' in options or len(engine_names) > 1):
+        print("<ERROR> Sampling can not be used with --condensed, --state or --cross-check!")
+        sys.exit(1)
+    if sample_size is not None and ('engine' in options or 'workers' in options or 'cache' in options):
+        # the sample is mined with Apriori in this process, and the input file is read line by line without the cache
+        print("<ERROR> Sampling can not be used with --engine, --workers or --cache!")
+        sys.exit(1)
+    if sample_mode not in ('exact', 'approximate'):
+        print("<ERROR> Sample mode should be exact or approximate!")
+        sys.exit(1)
+    state_file_name = options.get('state')  # state of the incremental mode. The input is a delta if it exists.
+    metrics_file_name = options.get('metrics')  # JSON file of the seconds of each phase and the work counters
+    if metrics_file_name is not None:
+        run_metrics = {'phases': dict(), 'counters': dict()}
+    start = time.perf_counter()
+    state = None
+    if state_file_name is not None and os.path.exists(state_file_name):
+        state = load_incremental_state(state_file_name)
+        if state['minimum_support'] != float(minimum_support_str):
+            print("<ERROR> Minimum support should be %s, the same as the state!" % state['minimum_support'])
+            sys.exit(1)
 
+    if sample_size is not None:
+        # the sampling mode reads the input file by itself, with one pass for the sample and one for the counts
+        seed = int(options.get('seed', 0))
+        if sample_mode == 'exact':
+            frequent_itemset_list, num_of_transactions = get_frequent_itemset_list_toivonen(
+                input_file_name, float(minimum_support_str), int(sample_size), float(options.get('sample-lowering', 0.8)), seed)
+        else:
+            frequent_itemset_list, num_of_transactions = get_frequent_itemset_list_approximate(
+                input_file_name, float(minimum_support_str), int(sample_size), seed)
+        start = record_phase('mine', start)
+        minimum_confidence = float(options.get('min-conf', 0))  # minimum confidence (%)
+        association_rules = generate_association_rules(frequent_itemset_list, num_of_transactions, minimum_confidence)
+        write_association_rules(association_rules, output_file_name)
+        record_phase('rules', start)
+        write_metrics(metrics_file_name)
+        sys.exit()
 
+    # Read the transactions into the encoded (CSR) form, memory-mapped from the cache file if it is given
+    transactions = load_transactions(input_file_name, options.get('cache'))
+    start = record_phase('load', start)
 
+    # number of transactions (used to calculate minimum support)
+    num_of_transactions = len(transactions)
+    if state is not None:  # the whole data = the data of the state + the delta
+        num_of_transactions += state['num_of_transactions']
+
+    # minimum support (counts) -> 500 * 10% = 50.0
+    minimum_support = float(minimum_support_str) / 100 * num_of_transactions   # minimum support input can be a float type
 
+    # each transaction of 'transactions' is now such like [7, 14], [9], [1, 2, 4, 5, 18]
+    if condensed_type is not None:
+        # rules need the support of every subset, so only the itemsets are written
+        condensed_itemset_list = get_condensed_itemset_list(transactions, minimum_support, condensed_type)
+        write_frequent_itemsets(condensed_itemset_list, num_of_transactions, output_file_name)
+        record_phase('mine', start)
+    else:
+        # get frequent itemset list using apriori algorithm. Index 0 refers to L_1
+        if state is not None:
+            frequent_itemset_list = update_incremental_state(state, transactions, os.path.abspath(input_file_name))
+        elif len(engine_names) > 1:
+            try:
+                frequent_itemset_list = cross_check_engines(transactions, minimum_support, engine_names, workers)
+            except AssertionError as error:
+                print("<ERROR> Cross-check failed: %s" % error)
+                sys.exit(1)
+        else:
+            frequent_itemset_list = mine_frequent_itemsets(transactions, minimum_support, engine_name, workers)  # frequent_itemset_list == [{(16,): 212, (3,): 150, (8,): 226}, {(8, 16): 151}]
+        # print(frequent_itemset_list)
+        if state_file_name is not None:
+            if state is None:
+                state = build_incremental_state(transactions, frequent_itemset_list, float(minimum_support_str),
+                                                os.path.abspath(input_file_name))
+            save_incremental_state(state, state_file_name)
+        start = record_phase('mine', start)
+        # find association rules for each frequent itemset, and write them into the file while they are generated.
+        minimum_confidence = float(options.get('min-conf', 0))  # minimum confidence (%)
+        association_rules = generate_association_rules(frequent_itemset_list, num_of_transactions, minimum_confidence)
+        write_association_rules(association_rules, output_file_name)
+        record_phase('rules', start)
+    write_metrics(metrics_file_name)
@@ -0,0 +1,186 @@
+import sys
+import glob
+import math
+import os
+import random
+import subprocess
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from measure import run_measured  # noqa: E402
+
+
+def generate_transactions(filename, num_of_transactions, num_of_items=1000, num_of_patterns=50, seed=0):
+    """
+        Write random baskets into the filename, in the input format of hw1.
+        Each basket takes one of the planted patterns (to make long frequent itemsets) and some random items.
+
+        Parameters:
+            filename (str): File name to write. ex. "bench_input.txt"
+            num_of_transactions (int): Number of baskets
+            num_of_items (int): Item ids are 0 ~ (num_of_items - 1)
+            num_of_patterns (int): Number of planted patterns
+            seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    patterns = [rng.sample(range(num_of_items), rng.randint(2, 6)) for _ in range(num_of_patterns)]
+    with open(filename, 'w') as file:
+        for _ in range(num_of_transactions):
+            basket = set(rng.choice(patterns))
+            basket.update(rng.randrange(num_of_items) for _ in range(rng.randint(1, 10)))
+            file.write('\t'.join(str(item) for item in basket) + '\n')
+
+
+def generate_quest_transactions(filename, num_of_transactions, average_transaction_length=10, average_pattern_length=4,
+                                num_of_items=1000, num_of_patterns=200, correlation=0.5, seed=0):
+    """
+        Write baskets into the filename in the way of the IBM Quest generator (Agrawal and Srikant, 1994).
+        Patterns have Poisson lengths and exponential weights, and share a part of their items with the previous pattern.
+        Each basket (of a Poisson size) is filled with weighted random patterns, each of them corrupted by dropping
+        some of its items.
+
+        Parameters:
+            filename (str): File name to write. ex. "bench_input.txt"
+            num_of_transactions (int): Number of baskets (|D|)
+            average_transaction_length (float): Average size of the baskets (|T|)
+            average_pattern_length (float): Average size of the patterns (|I|)
+            num_of_items (int): Item ids are 0 ~ (num_of_items - 1) (N)
+            num_of_patterns (int): Number of patterns (|L|)
+            correlation (float): Average fraction of the items taken from the previous pattern
+            seed (int): Random seed
+    """
+    rng = random.Random(seed)
+
+    def poisson(mean):
+        # Knuth's method, fine for small means
+        limit, count, product = math.exp(-mean), 0, rng.random()
+        while product > limit:
+            count += 1
+            product *= rng.random()
+        return count
+
+    patterns = []
+    for _ in range(num_of_patterns):
+        length = max(1, poisson(average_pattern_length))
+        pattern = set()
+        if patterns:
+            previous = patterns[-1][0]
+            pattern.update(rng.sample(previous, min(len(previous), int(length * min(1.0, rng.expovariate(1 / correlation))))))
+        while len(pattern) < length:
+            pattern.add(rng.randrange(num_of_items))
+        # weight, and the corruption level (the chance to drop each item when the pattern is used)
+        patterns.append((list(pattern), rng.expovariate(1), min(1.0, max(0.0, rng.gauss(0.5, 0.1)))))
+    pattern_list = [pattern for pattern, _, _ in patterns]
+    weights = [weight for _, weight, _ in patterns]
+    corruptions = [corruption for _, _, corruption in patterns]
+
+    with open(filename, 'w') as file:
+        for _ in range(num_of_transactions):
+            size = max(1, poisson(average_transaction_length))
+            basket = set()
+            while len(basket) < size:
+                index = rng.choices(range(num_of_patterns), weights)[0]
+                basket.update(item for item in pattern_list[index] if rng.random() >= corruptions[index])
+                if not basket:
+                    basket.add(rng.randrange(num_of_items))
+            file.write('\t'.join(str(item) for item in basket) + '\n')
+
+
+def run_miner(minimum_support, input_file_name, output_file_name, workers):
+    """
+        Run hw1 with the given number of workers, and return the wall time in seconds.
+    """
+    script = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*_hw1.py'))[0]
+    start = time.perf_counter()
+    subprocess.run([sys.executable, script, str(minimum_support), input_file_name, output_file_name,
+                    '--workers', str(workers)], check=True)
+    return time.perf_counter() - start
+
+
+def main(num_of_transactions='200000', minimum_support='1', max_workers=None):
+    """
+        Print the wall time and the speedup of the SON mode of hw1 for 1, 2, 4, ... workers.
+        Exits with 1 if the output with more workers differs from the output with 1 worker.
+
+        ex. python benchmark.py 200000 1 8
+    """
+    num_of_transactions = int(num_of_transactions)
+    max_workers = int(max_workers) if max_workers is not None else os.cpu_count()
+    input_file_name = 'bench_input.txt'
+    generate_transactions(input_file_name, num_of_transactions)
+
+    worker_counts = []
+    workers = 1
+    while workers < max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(max_workers)
+
+    print("workers\tseconds\tspeedup")
+    base_seconds = None
+    expected_output = None
+    for workers in worker_counts:
+        output_file_name = 'bench_output_%d.txt' % workers
+        seconds = run_miner(minimum_support, input_file_name, output_file_name, workers)
+        with open(output_file_name, 'r') as file:
+            output = file.read()
+        os.remove(output_file_name)
+        if expected_output is None:
+            base_seconds, expected_output = seconds, output
+        elif output != expected_output:
+            print("<ERROR> Output with %d workers differs from the output with 1 worker!" % workers)
+            os.remove(input_file_name)
+            sys.exit(1)
+        print("%d\t%.2f\t%.2f" % (workers, seconds, base_seconds / seconds))
+    os.remove(input_file_name)
+
+
+def run_miner_measured(minimum_support, input_file_name, output_file_name, *options):
+    """
+        Run hw1 and return (wall time in seconds, peak RSS in KB).
+    """
+    script = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*_hw1.py'))[0]
+    return run_measured(script, minimum_support, input_file_name, output_file_name, *options)
+
+
+def check_references():
+    """
+        Compare the rules of hw1_input_example.txt at 2% with output.txt, byte for byte.
+        Return True if they are the same.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    run_miner_measured(2, os.path.join(directory, 'hw1_input_example.txt'), 'bench_reference.txt')
+    with open('bench_reference.txt', 'rb') as file, open(os.path.join(directory, 'output.txt'), 'rb') as reference:
+        same = file.read() == reference.read()
+    os.remove('bench_reference.txt')
+    print("reference\thw1_input_example.txt 2%%\t%s" % ('ok' if same else 'DIFFERENT'))
+    return same
+
+
+def sweep(sizes='10000,20000,40000', minimum_supports='2,1,0.5', *options):
+    """
+        Print the wall time and the peak RSS of hw1 on IBM-Quest-style data for each size and minimum support,
+        after checking the output of the example input (exits with 1 if it differs). The options are passed to hw1.
+
+        ex. python benchmark.py sweep 100000,1000000 1,0.5 --engine fp-growth
+    """
+    if not check_references():
+        sys.exit(1)
+    input_file_name, output_file_name = 'bench_input.txt', 'bench_output.txt'
+    print("transactions\tmin_support\tseconds\tpeak_rss_kb\trules")
+    for num_of_transactions in (int(size) for size in sizes.split(',')):
+        generate_quest_transactions(input_file_name, num_of_transactions)
+        for minimum_support in minimum_supports.split(','):
+            seconds, peak_rss = run_miner_measured(minimum_support, input_file_name, output_file_name, *options)
+            with open(output_file_name, 'r') as file:
+                num_of_rules = sum(1 for _ in file)
+            print("%d\t%s\t%.2f\t%d\t%d" % (num_of_transactions, minimum_support, seconds, peak_rss, num_of_rules))
+    for filename in (input_file_name, output_file_name):
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['sweep']:
+        sweep(*sys.argv[2:])
+    else:
+        main(*sys.argv[1:])
@@ -1,6 +1,49 @@
 import sys
+import json
 import math
-from collections import Counter, defaultdict
+import time
+from array import array
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+
+run_metrics = None  # {'phases': {phase: seconds}, 'counters': {name: count}}, recorded only when main gets a metrics file
+
+
+def add_metric(name, value=1, key=None):
+    """
+        Add value to the counter, or to its entry for the key (ex. a depth). Does nothing unless metrics are recorded.
+    """
+    if run_metrics is None:
+        return
+    if key is None:
+        run_metrics['counters'][name] = run_metrics['counters'].get(name, 0) + value
+    else:
+        counter = run_metrics['counters'].setdefault(name, dict())
+        counter[key] = counter.get(key, 0) + value
+
+
+def merge_metrics(counters):
+    """
+        Add the counters of a worker process to the counters of this process.
+    """
+    for name, value in counters.items():
+        if type(value) is dict:
+            for key, key_value in value.items():
+                add_metric(name, key_value, key)
+        else:
+            add_metric(name, value)
+
+
+def record_phase(phase, start):
+    """
+        Add the seconds since start to the phase, and return the time now as the start of the next phase.
+    """
+    now = time.perf_counter()
+    if run_metrics is not None:
+        run_metrics['phases'][phase] = run_metrics['phases'].get(phase, 0.0) + now - start
+    return now
 
 
 def load_data(filename):
@@ -26,6 +69,66 @@ def load_data(filename):
         return examples, feature_attribute_names, target_attribute_name
 
 
+class ColumnarDataset:
+    """
+        Examples stored column by column. Each value of a column is encoded once into a small int code,
+        so a column takes 1 or 2 bytes per example instead of a dict entry.
+
+        Attributes:
+            attribute_names (list): Names of all columns. ex. ['age', 'income', ..., 'Class:buys_computer']
+            columns (list): A list of array of value codes for each column.
+            value_names (list): A list of code -> value for each column. ex. [['<=30', '31...40', '>40'], ...]
+            value_codes (list): A list of value -> code for each column. ex. [{'<=30': 0, '31...40': 1, '>40': 2}, ...]
+    """
+
+    def __init__(self, attribute_names):
+        self.attribute_names = attribute_names
+        self.columns = [array('B') for _ in attribute_names]
+        self.value_names = [[] for _ in attribute_names]
+        self.value_codes = [dict() for _ in attribute_names]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def append(self, values):
+        """
+            Encode and append one example. ex. ['<=30', 'high', 'no', 'fair', 'no']
+        """
+        for index, value in enumerate(values):
+            code = self.value_codes[index].get(value)
+            if code is None:
+                code = len(self.value_names[index])
+                self.value_codes[index][value] = code
+                self.value_names[index].append(value)
+                if code == 256:  # widen the column when it has more values than 1 byte can hold
+                    self.columns[index] = array('H', self.columns[index])
+                elif code == 65536:
+                    self.columns[index] = array('i', self.columns[index])
+            self.columns[index].append(code)
+
+
+def load_columnar_data(filename):
+    """
+        Read the data from the given filename into a ColumnarDataset, line by line.
+
+        Parameters:
+            filename (str): File name to read.
+                ex. "dt_train.txt"
+        Return:
+            dataset (ColumnarDataset): Encoded examples. The last column is the target.
+            feature_attribute_names (list): A list of feature names (except target).
+                ex. ['age', 'income', 'student', 'credit_rating']
+            target_attribute_name (str): A name of target attribute.
+                ex. "Class:buys_computer"
+    """
+    with open(filename, 'r') as file:
+        attribute_names = file.readline().strip().split('\t')
+        dataset = ColumnarDataset(attribute_names)
+        for line in file:
+            dataset.append(line.strip().split('\t'))
+        return dataset, attribute_names[:-1], attribute_names[-1]
+
+
 def entropy(examples, target_attribute_name):
     """
         Return the entropy of the examples, using target_attribute_name
@@ -44,7 +147,7 @@ def entropy(examples, target_attribute_name):
     return -sum((count / examples_len) * math.log2(count / examples_len) for count in target_val_counts.values())
 
 
-def information_gain(examples, attribute_name, target_attribute_name):
+def information_gain(examples, attribute_name, target_attribute_name, original_entropy=None):
     """
         Return the information gain of the examples. (Info(D) - Info_A(D))
 
@@ -55,12 +158,14 @@ def information_gain(examples, attribute_name, target_attribute_name):
                 ex. "age"
             target_attribute_name (str): The name of target attribute
                 ex. "Class:buys_computer"
+            original_entropy (float): Info(D), if it is already computed.
         Return:
             (float): The entropy value.
 
     """
     branches = defaultdict(list)
-    original_entropy = entropy(examples, target_attribute_name)
+    if original_entropy is None:
+        original_entropy = entropy(examples, target_attribute_name)
     for example in examples:
         branches[example[attribute_name]].append(example)
     after_entropy = sum((len(examples_in_branch) / len(examples)) * entropy(examples_in_branch, target_attribute_name) for examples_in_branch in branches.values())
@@ -85,7 +190,7 @@ def split_information(examples, attribute_name):
     return -sum((count / examples_len) * math.log2(count / examples_len) for count in counts.values())
 
 
-def gain_ratio(examples, attribute_name, target_attribute_name):
+def gain_ratio(examples, attribute_name, target_attribute_name, parent_entropy=None):
     """
         Return the gain ratio of the examples. (Gain(A) - SplitInfo_A(D))
 
@@ -96,11 +201,14 @@ def gain_ratio(examples, attribute_name, target_attribute_name):
                 ex. "age"
             target_attribute_name (str): The name of target attribute
                 ex. "Class:buys_computer"
+            parent_entropy (float): The entropy of the examples, if it is already computed.
         Return:
             (float): The gain_ratio.
 
     """
-    info_gain = information_gain(examples, attribute_name, target_attribute_name)
+    if run_metrics is not None:
+        add_metric('gain_ratio_evaluations')
+    info_gain = information_gain(examples, attribute_name, target_attribute_name, parent_entropy)
     split_info = split_information(examples, attribute_name)
     if split_info != 0 and info_gain != 0:
         return info_gain / split_info
@@ -108,7 +216,64 @@ def gain_ratio(examples, attribute_name, target_attribute_name):
         return 0
 
 
-def build_tree(examples, feature_attribute_names, target_attribute_name):
+def entropy_from_counts(counts):
+    """
+        Return the entropy of a distribution given by its counts. ex. [9, 5] -> 0.940...
+    """
+    total = sum(counts)
+    return -sum((count / total) * math.log2(count / total) for count in counts)
+
+
+def gain_ratio_from_counts(branch_class_counts, parent_entropy, examples_len):
+    """
+        Return the gain ratio of a split from its contingency table.
+        It is the same value as gain_ratio, which computes it from the examples.
+
+        Parameters:
+            branch_class_counts (dict): attribute value -> (class -> count), in the order of appearance.
+                ex. {'<=30': {'no': 3, 'yes': 2}, '31...40': {'yes': 4}, '>40': {'yes': 3, 'no': 2}}
+            parent_entropy (float): The entropy of the examples before the split.
+            examples_len (int): The number of the examples.
+        Return:
+            (float): The gain_ratio.
+    """
+    if run_metrics is not None:
+        add_metric('gain_ratio_evaluations')
+    branch_lens = [sum(class_counts.values()) for class_counts in branch_class_counts.values()]
+    after_entropy = sum((branch_len / examples_len) * entropy_from_counts(class_counts.values())
+                        for branch_len, class_counts in zip(branch_lens, branch_class_counts.values()))
+    info_gain = parent_entropy - after_entropy
+    split_info = entropy_from_counts(branch_lens)
+    if split_info != 0 and info_gain != 0:
+        return info_gain / split_info
+    else:
+        return 0
+
+
+def get_contingency_tables(dataset, node_rows, attribute_indices):
+    """
+        Count (attribute value, class) pairs of the given rows for every given attribute.
+        Codes of each column are gathered once and counted by Counter, without building any example.
+
+        Parameters:
+            dataset (ColumnarDataset): Encoded examples. The last column is the target.
+            node_rows (memoryview or list): Indices of the examples in the node.
+            attribute_indices (list): Column indices of the attributes.
+        Return:
+            (list): For each attribute, value code -> (class code -> count), in the order of appearance.
+    """
+    target_codes = list(map(dataset.columns[-1].__getitem__, node_rows))
+    contingency_tables = []
+    for attribute_index in attribute_indices:
+        column = dataset.columns[attribute_index]
+        table = dict()
+        for (value_code, class_code), count in Counter(zip(map(column.__getitem__, node_rows), target_codes)).items():
+            table.setdefault(value_code, dict())[class_code] = count
+        contingency_tables.append(table)
+    return contingency_tables
+
+
+def build_tree(examples, feature_attribute_names, target_attribute_name, depth=0):
     """
         Build a decision tree recursively. It can be a dictionary or a string.
 
@@ -119,23 +284,112 @@ def build_tree(examples, feature_attribute_names, target_attribute_name):
                 ex. ["age", "income", ...]
             feature_attribute_name (str): The name of target attribute
                 ex. "Class:buys_computer"
+            depth (int): The depth of the node. (0 for the root)
         Return:
             (dict) or (str): The node of the decision tree
 
     """
+    if run_metrics is not None:
+        add_metric('nodes')
+        add_metric('rows_per_depth', len(examples), depth)
     distinct_targets = set(example[target_attribute_name] for example in examples)
     if len(distinct_targets) == 1:
         return distinct_targets.pop()
     elif len(feature_attribute_names) == 0:  # no more attributes to compare
         return Counter(example[target_attribute_name] for example in examples).most_common(1)[0][0]  # Return most common target attribute
-    best_attribute_name = max(feature_attribute_names, key=lambda attribute: gain_ratio(examples, attribute, target_attribute_name))
+    parent_entropy = entropy(examples, target_attribute_name)  # same for every attribute
+    best_attribute_name = max(feature_attribute_names, key=lambda attribute: gain_ratio(examples, attribute, target_attribute_name, parent_entropy))
     remaining_attribute_names = [attribute for attribute in feature_attribute_names if attribute != best_attribute_name]
     branched_examples = defaultdict(list)  # list of branched examples separated by "best_attribute_name"
     tree = {best_attribute_name: {}}
     for example in examples:
         branched_examples[example[best_attribute_name]].append(example)
     for best_attribute_value, examples_in_one_branch in branched_examples.items():
-        tree[best_attribute_name][best_attribute_value] = build_tree(examples_in_one_branch, remaining_attribute_names, target_attribute_name)
+        tree[best_attribute_name][best_attribute_value] = build_tree(examples_in_one_branch, remaining_attribute_names, target_attribute_name, depth + 1)
+    return tree
+
+
+def partition_rows(rows, scratch, start, end, column, branch_counts):
+    """
+        Stable partition of rows[start:end] by the value codes of the column, in place.
+        Each branch keeps the original order of its rows, like the branched lists of build_tree.
+
+        Parameters:
+            rows (array): The row buffer shared by the whole tree.
+            scratch (array): A buffer as long as rows.
+            start (int), end (int): The range of the node in rows.
+            column (array): Value codes of the branching attribute.
+            branch_counts (dict): value code -> number of rows, in the order of the branches.
+        Return:
+            (list): (value code, start, end) of each branch.
+    """
+    branch_ranges = []
+    next_positions = dict()
+    position = start
+    for value_code, count in branch_counts.items():
+        branch_ranges.append((value_code, position, position + count))
+        next_positions[value_code] = position
+        position += count
+    for i in range(start, end):
+        row = rows[i]
+        value_code = column[row]
+        scratch[next_positions[value_code]] = row
+        next_positions[value_code] += 1
+    memoryview(rows)[start:end] = memoryview(scratch)[start:end]
+    return branch_ranges
+
+
+def build_tree_columnar(dataset, attribute_indices, rows=None, scratch=None, start=0, end=None, depth=0):
+    """
+        Build the same decision tree as build_tree, from a ColumnarDataset.
+        The contingency tables of all attributes are counted at once for each node.
+        Nodes are ranges of one row buffer, which is partitioned in place for the children,
+        so induction takes O(n) memory for the indices whatever the depth is.
+
+        Parameters:
+            dataset (ColumnarDataset): Encoded examples. The last column is the target.
+            attribute_indices (list): Column indices of the attributes which are not used yet.
+                ex. [0, 1, 2, 3]
+            rows (array): Row indices of the examples. Every example is used if it is None.
+            scratch (array): A buffer as long as rows for the partitioning.
+            start (int), end (int): The node is rows[start:end].
+            depth (int): The depth of the node. (0 for the root)
+        Return:
+            (dict) or (str): The node of the decision tree
+
+    """
+    if rows is None:
+        rows = array('i', range(len(dataset)))
+    if scratch is None:
+        scratch = array('i', bytes(4 * len(rows)))
+    if end is None:
+        end = len(rows)
+    node_rows = memoryview(rows)[start:end]
+    if run_metrics is not None:
+        add_metric('nodes')
+        add_metric('rows_per_depth', end - start, depth)
+    target_column = dataset.columns[-1]
+    class_counts = Counter(map(target_column.__getitem__, node_rows))
+    if len(class_counts) == 1:
+        return dataset.value_names[-1][next(iter(class_counts))]
+    elif len(attribute_indices) == 0:  # no more attributes to compare
+        return dataset.value_names[-1][class_counts.most_common(1)[0][0]]  # Return most common target attribute
+    parent_entropy = entropy_from_counts(class_counts.values())  # computed once for every attribute
+    contingency_tables = get_contingency_tables(dataset, node_rows, attribute_indices)
+    best_position = max(range(len(attribute_indices)),
+                        key=lambda position: gain_ratio_from_counts(contingency_tables[position], parent_entropy, end - start))
+    best_attribute_index = attribute_indices[best_position]
+    remaining_attribute_indices = [index for index in attribute_indices if index != best_attribute_index]
+    branch_counts = {value_code: sum(class_counts.values())
+                     for value_code, class_counts in contingency_tables[best_position].items()}
+    del contingency_tables
+
+    branch_ranges = partition_rows(rows, scratch, start, end, dataset.columns[best_attribute_index], branch_counts)
+    attribute_name = dataset.attribute_names[best_attribute_index]
+    value_names = dataset.value_names[best_attribute_index]
+    tree = {attribute_name: {}}
+    for value_code, branch_start, branch_end in branch_ranges:
+        tree[attribute_name][value_names[value_code]] = build_tree_columnar(dataset, remaining_attribute_indices, rows, scratch, branch_start, branch_end, depth + 1)
     return tree
 
 
@@ -162,26 +416,443 @@ def classify(tree, example):
     return None  # If attribute value of training example is not in the tree
 
 
+shared_dataset = None  # ColumnarDataset on shared memory, in each worker process of build_tree_parallel
+
+
+def share_columns(dataset):
+    """
+        Copy the columns of the dataset into shared memory blocks.
+
+        Parameters:
+            dataset (ColumnarDataset): Encoded examples.
+        Return:
+            (list): SharedMemory blocks, which should be closed and unlinked by the caller.
+            (list): (block name, typecode, length) of each column, to attach it in other processes.
+    """
+    blocks = []
+    descriptors = []
+    for column in dataset.columns:
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(column) * column.itemsize))
+        block.buf[:len(column) * column.itemsize] = column.tobytes()
+        blocks.append(block)
+        descriptors.append((block.name, column.typecode, len(column)))
+    return blocks, descriptors
+
+
+def attach_shared_dataset(descriptors, attribute_names, value_names):
+    """
+        Initializer of the worker processes. Build shared_dataset on the shared columns without copying them.
+    """
+    global shared_dataset
+    shared_dataset = ColumnarDataset(attribute_names)
+    shared_dataset.value_names = value_names
+    shared_dataset.blocks = []
+    for index, (name, typecode, length) in enumerate(descriptors):
+        block = shared_memory.SharedMemory(name=name)
+        shared_dataset.blocks.append(block)
+        shared_dataset.columns[index] = block.buf[:length * array(typecode).itemsize].cast(typecode)
+
+
+def score_attributes_task(rows, attribute_indices, parent_entropy):
+    """
+        Return the gain ratios of the given attributes at the node of the given rows of shared_dataset.
+    """
+    return [gain_ratio_from_counts(table, parent_entropy, len(rows))
+            for table in get_contingency_tables(shared_dataset, rows, attribute_indices)]
+
+
+def build_subtree_task(rows, attribute_indices, depth, record_metrics=False):
+    """
+        Build the subtree of the given rows of shared_dataset, whose root is at the given depth.
+        Return the subtree, and its counters if record_metrics is True (otherwise None).
+    """
+    global run_metrics
+    run_metrics = {'phases': dict(), 'counters': dict()} if record_metrics else None
+    subtree = build_tree_columnar(shared_dataset, attribute_indices, rows, depth=depth)
+    return subtree, run_metrics and run_metrics['counters']
+
+
+def build_tree_parallel(dataset, attribute_indices, workers, parallel_min_rows=100000):
+    """
+        Build the same decision tree as build_tree_columnar with worker processes.
+        The columns are put in shared memory once. The top of the tree is built breadth-first in this process:
+        a node is split here while it has at least parallel_min_rows examples (its attributes are then scored
+        in parallel, in chunks) or while fewer nodes than workers are open. Every other open node becomes a task,
+        where a worker builds the whole subtree from the row indices of the node.
+
+        Parameters:
+            dataset (ColumnarDataset): Encoded examples. The last column is the target.
+            attribute_indices (list): Column indices of the attributes. ex. [0, 1, 2, 3]
+            workers (int): Number of worker processes.
+            parallel_min_rows (int): The attributes of a node are scored in parallel only for this many examples.
+        Return:
+            (dict) or (str): The decision tree
+    """
+    target_column = dataset.columns[-1]
+    class_counts = Counter(target_column)
+    if len(class_counts) <= 1 or len(attribute_indices) == 0:
+        return build_tree_columnar(dataset, attribute_indices)
+
+    rows = array('i', range(len(dataset)))
+    scratch = array('i', bytes(4 * len(rows)))
+    root = {None: None}  # the tree is put under root[None]
+    blocks, descriptors = share_columns(dataset)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_shared_dataset,
+                                 initargs=(descriptors, dataset.attribute_names, dataset.value_names)) as executor:
+            # open nodes: (start, end, attribute indices, depth, parent dict, key in the parent)
+            queue = deque([(0, len(rows), attribute_indices, 0, root, None)])
+            tasks = []  # (future, parent dict, key in the parent)
+            while queue:
+                start, end, node_attribute_indices, depth, parent, key = queue.popleft()
+                node_rows = memoryview(rows)[start:end]
+                class_counts = Counter(map(target_column.__getitem__, node_rows))
+                if len(class_counts) == 1 or len(node_attribute_indices) == 0 or \
+                        (end - start < parallel_min_rows and len(queue) + len(tasks) + 1 >= workers):
+                    # a leaf is decided in the same way by the task, which also counts its metrics
+                    tasks.append((executor.submit(build_subtree_task, rows[start:end], node_attribute_indices, depth,
+                                                  run_metrics is not None), parent, key))
+                    continue
+                add_metric('nodes')
+                add_metric('rows_per_depth', end - start, depth)
+                parent_entropy = entropy_from_counts(class_counts.values())
+                if end - start >= parallel_min_rows:
+                    chunks = [node_attribute_indices[i::workers] for i in range(workers) if node_attribute_indices[i::workers]]
+                    chunk_rows = rows[start:end]
+                    chunk_ratios = list(executor.map(score_attributes_task, [chunk_rows] * len(chunks), chunks,
+                                                     [parent_entropy] * len(chunks)))
+                    gain_ratios = dict()
+                    for chunk, ratios in zip(chunks, chunk_ratios):
+                        gain_ratios.update(zip(chunk, ratios))
+                    add_metric('gain_ratio_evaluations', len(node_attribute_indices))
+                else:
+                    gain_ratios = dict(zip(node_attribute_indices, (gain_ratio_from_counts(table, parent_entropy, end - start)
+                                       for table in get_contingency_tables(dataset, node_rows, node_attribute_indices))))
+                best_attribute_index = max(node_attribute_indices, key=gain_ratios.__getitem__)
+                remaining_attribute_indices = [index for index in node_attribute_indices if index != best_attribute_index]
+
+                column = dataset.columns[best_attribute_index]
+                branch_counts = Counter(map(column.__getitem__, node_rows))  # in the order of appearance
+                del node_rows
+                branch_ranges = partition_rows(rows, scratch, start, end, column, branch_counts)
+                value_names = dataset.value_names[best_attribute_index]
+                children = dict()
+                parent[key] = {dataset.attribute_names[best_attribute_index]: children}
+                for value_code, branch_start, branch_end in branch_ranges:
+                    children[value_names[value_code]] = None  # keeps the order of the branches
+                    queue.append((branch_start, branch_end, remaining_attribute_indices, depth + 1,
+                                  children, value_names[value_code]))
+
+            for future, parent, key in tasks:
+                parent[key], counters = future.result()
+                if counters is not None:
+                    merge_metrics(counters)
+            return root[None]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def build_tree_streaming(train_file):
+    """
+        Build the same decision tree as build_tree without loading the training data into memory.
+        The tree grows breadth-first. Each level makes one sequential pass over the training file, where every
+        example is routed down the tree built so far and counted into the (attribute, value, class) table of
+        its node. The gain ratios are computed from these counts alone.
+
+        Parameters:
+            train_file (str): File name of the training data. ex. "dt_train.txt"
+        Return:
+            (dict) or (str): The decision tree.
+            (ColumnarDataset): A dataset without examples, which has the codes of every value for compile_tree.
+    """
+    with open(train_file, 'r') as file:
+        attribute_names = file.readline().strip().split('\t')
+    target_index = len(attribute_names) - 1
+
+    # node id -> (attribute index, {value: child node id}) for the internal nodes, class name for the leaves,
+    # or the list of the remaining attribute indices for the nodes which are not decided yet.
+    nodes = [list(range(target_index))]
+    frontier = [0]
+    vocabulary = None
+    depth = 0
+    while frontier:
+        # node id -> (class counts, [value -> class counts for each remaining attribute])
+        statistics = {node_id: (dict(), [dict() for _ in nodes[node_id]]) for node_id in frontier}
+        with open(train_file, 'r') as file:
+            file.readline()
+            for line in file:
+                values = line.strip().split('\t')
+                node_id = 0
+                node = nodes[0]
+                while type(node) is tuple:
+                    node_id = node[1][values[node[0]]]
+                    node = nodes[node_id]
+                if type(node) is str:
+                    continue
+                class_name = values[target_index]
+                class_counts, tables = statistics[node_id]
+                class_counts[class_name] = class_counts.get(class_name, 0) + 1
+                for attribute_index, table in zip(node, tables):
+                    branch_class_counts = table.get(values[attribute_index])
+                    if branch_class_counts is None:
+                        branch_class_counts = table[values[attribute_index]] = dict()
+                    branch_class_counts[class_name] = branch_class_counts.get(class_name, 0) + 1
+        if vocabulary is None:  # the root sees every value
+            vocabulary = statistics[0]
+
+        next_frontier = []
+        for node_id in frontier:
+            class_counts, tables = statistics[node_id]
+            attribute_indices = nodes[node_id]
+            if run_metrics is not None:
+                add_metric('nodes')
+                add_metric('rows_per_depth', sum(class_counts.values()), depth)
+            if len(class_counts) == 1:
+                nodes[node_id] = next(iter(class_counts))
+                continue
+            elif len(attribute_indices) == 0:  # no more attributes to compare
+                nodes[node_id] = Counter(class_counts).most_common(1)[0][0]  # Return most common target attribute
+                continue
+            parent_entropy = entropy_from_counts(class_counts.values())
+            examples_len = sum(class_counts.values())
+            best_position = max(range(len(attribute_indices)),
+                                key=lambda position: gain_ratio_from_counts(tables[position], parent_entropy, examples_len))
+            best_attribute_index = attribute_indices[best_position]
+            remaining_attribute_indices = [index for index in attribute_indices if index != best_attribute_index]
+            children = dict()
+            for value, branch_class_counts in tables[best_position].items():
+                children[value] = len(nodes)
+                # a child is decided from the counts of the branch if it does not need another pass
+                if run_metrics is not None and (len(branch_class_counts) == 1 or len(remaining_attribute_indices) == 0):
+                    add_metric('nodes')
+                    add_metric('rows_per_depth', sum(branch_class_counts.values()), depth + 1)
+                if len(branch_class_counts) == 1:
+                    nodes.append(next(iter(branch_class_counts)))
+                elif len(remaining_attribute_indices) == 0:
+                    nodes.append(Counter(branch_class_counts).most_common(1)[0][0])
+                else:
+                    nodes.append(remaining_attribute_indices)
+                    next_frontier.append(children[value])
+            nodes[node_id] = (best_attribute_index, children)
+        frontier = next_frontier
+        depth += 1
+        add_metric('file_passes')
+
+    dataset = ColumnarDataset(attribute_names)
+    class_counts, tables = vocabulary if vocabulary is not None else (dict(), [])
+    for index, values in enumerate([list(table) for table in tables] + [list(class_counts)]):
+        dataset.value_names[index] = values
+        dataset.value_codes[index] = {value: code for code, value in enumerate(values)}
+
+    def to_dict(node_id):
+        node = nodes[node_id]
+        if type(node) is not tuple:
+            return node
+        return {attribute_names[node[0]]: {value: to_dict(child_id) for value, child_id in node[1].items()}}
+
+    return to_dict(0), dataset
+
+
+class CompiledTree:
+    """
+        A decision tree flattened into arrays, for classification without recursion or dict lookups.
+        Node 0 is the root. An internal node n branches on the column features[n], and its child for
+        value code v is children[child_offsets[n] + v] (-1 if v did not appear in the branch).
+        A leaf has features[n] == -1 and its class code is labels[n].
+
+        Attributes:
+            features (array): Column index of each node, -1 for a leaf.
+            child_offsets (array): Offset of the children of each node in children.
+            children (array): Child node indices of all internal nodes.
+            labels (array): Class code of each leaf, -1 for an internal node.
+            label_names (list): class code -> class name
+    """
+
+    def __init__(self, label_names):
+        self.features = array('i')
+        self.child_offsets = array('i')
+        self.children = array('i')
+        self.labels = array('i')
+        self.label_names = label_names
+
+
+def compile_tree(tree, dataset):
+    """
+        Flatten a decision tree of build_tree (or build_tree_columnar) into a CompiledTree.
+
+        Parameters:
+            tree (dict or str): Recursive form of decision tree. A leaf is string type.
+            dataset (ColumnarDataset): The training data of the tree, which gives the codes of the values.
+        Return:
+            (CompiledTree): The flattened tree.
+    """
+    compiled_tree = CompiledTree(dataset.value_names[-1])
+    attribute_indices = {attribute_name: index for index, attribute_name in enumerate(dataset.attribute_names)}
+    nodes = [tree]  # nodes[n] is the subtree of node n
+    n = 0
+    while n < len(nodes):
+        node = nodes[n]
+        if type(node) is str:
+            compiled_tree.features.append(-1)
+            compiled_tree.child_offsets.append(-1)
+            compiled_tree.labels.append(dataset.value_codes[-1][node])
+        else:
+            branching_attribute_name = list(node.keys())[0]
+            attribute_index = attribute_indices[branching_attribute_name]
+            compiled_tree.features.append(attribute_index)
+            compiled_tree.child_offsets.append(len(compiled_tree.children))
+            compiled_tree.labels.append(-1)
+            child_nodes = array('i', [-1] * len(dataset.value_names[attribute_index]))
+            for attribute_value, subtree in node[branching_attribute_name].items():
+                child_nodes[dataset.value_codes[attribute_index][attribute_value]] = len(nodes)
+                nodes.append(subtree)
+            compiled_tree.children.extend(child_nodes)
+        n += 1
+    return compiled_tree
+
+
+def predict_batch(compiled_tree, columns, num_of_rows):
+    """
+        Classify a batch of encoded examples.
+
+        Parameters:
+            compiled_tree (CompiledTree): The flattened tree.
+            columns (list): Value codes of each training column for the batch (-1 for a value unseen in training).
+                Columns which the tree does not use can be None.
+            num_of_rows (int): Number of examples in the batch.
+        Return:
+            (array): Class code of each example, -1 if it has a value which is not in the tree.
+    """
+    features = compiled_tree.features
+    child_offsets = compiled_tree.child_offsets
+    children = compiled_tree.children
+    labels = compiled_tree.labels
+    predictions = array('i', bytes(4 * num_of_rows))
+    for row in range(num_of_rows):
+        node = 0
+        feature = features[0]
+        while feature >= 0:
+            value_code = columns[feature][row]
+            node = children[child_offsets[node] + value_code] if value_code >= 0 else -1
+            if node < 0:
+                break
+            feature = features[node]
+        predictions[row] = labels[node] if node >= 0 else -1
+    return predictions
+
+
+def write_predictions(compiled_tree, dataset, test_file, result_file, batch_size=65536):
+    """
+        Classify the test data batch by batch, and write each example with its classification.
+        The output is the same as classifying each example of load_data with classify.
+
+        Parameters:
+            compiled_tree (CompiledTree): The flattened tree.
+            dataset (ColumnarDataset): The training data of the tree.
+            test_file (str): File name of the test data. ex. "dt_test.txt"
+            result_file (str): File name to write. ex. "dt_result.txt"
+            batch_size (int): Number of examples classified and written at a time.
+    """
+    label_names = compiled_tree.label_names + ['None']  # code -1 -> 'None'
+    with open(test_file, 'r') as test, open(result_file, 'w') as file:
+        file.write("".join(f"{attribute}\t" for attribute in dataset.attribute_names[:-1]))
+        file.write(f"{dataset.attribute_names[-1]}\n")
+
+        test_attribute_names = test.readline().strip().split('\t')
+        # test column position -> training column index
+        column_pairs = [(position, dataset.attribute_names.index(attribute_name))
+                        for position, attribute_name in enumerate(test_attribute_names)
+                        if attribute_name in dataset.attribute_names[:-1]]
+        while True:
+            batch = [line.strip().split('\t')[:len(test_attribute_names)] for line in islice(test, batch_size)]
+            if not batch:
+                break
+            columns = [None] * len(dataset.attribute_names)
+            for position, attribute_index in column_pairs:
+                value_codes = dataset.value_codes[attribute_index]
+                columns[attribute_index] = array('i', (value_codes.get(values[position], -1) if position < len(values) else -1
+                                                       for values in batch))
+            predictions = predict_batch(compiled_tree, columns, len(batch))
+            file.writelines("".join(f"{feature_val}\t" for feature_val in values) + f"{label_names[prediction]}\n"
+                            for values, prediction in zip(batch, predictions))
+
+
 # Main function
-def main(train_file, test_file, result_file):
-    # Load training data
-    train_examples, feature_attribute_names, target_attribute_name = load_data(train_file)
-    # Build a decision tree
-    decision_tree = build_tree(train_examples, feature_attribute_names, target_attribute_name)
-    # Load test data
-    test_examples, _, _ = load_data(test_file)
-    # Classify test data and write results
-    with open(result_file, 'w') as file:
-        for attribute in feature_attribute_names:
-            file.write(f"{attribute}\t")
-        file.write(f"{target_attribute_name}\n")
-
-        for example in test_examples:
-            classification = classify(decision_tree, example)
-            for feature_val in example.values():
-                file.write(f"{feature_val}\t")
-            file.write(f"{classification}\n")
+def main(train_file, test_file, result_file, workers=1, training='memory', metrics=None):
+    # training: 'memory' (the columns are loaded, and built in parallel with more than 1 worker) or 'streaming'
+    #           (one pass over the training file per level of the tree, without loading it)
+    # metrics: file to write the seconds of each phase and the work counters (ex. nodes) into, as JSON
+    global run_metrics
+    if metrics is not None:
+        run_metrics = {'phases': dict(), 'counters': dict()}
+    start = time.perf_counter()
+    workers = int(workers)
+    if training not in ('memory', 'streaming'):
+        raise ValueError(f'Unknown training {training} (choose from memory, streaming)')
+    if training == 'streaming' and workers > 1:
+        raise ValueError('Streaming training runs in one process, so it can not be used with workers')
+    if training == 'streaming':  # training data is read once per level, without being loaded
+        decision_tree, train_dataset = build_tree_streaming(train_file)
+        start = record_phase('build', start)
+        compiled_tree = compile_tree(decision_tree, train_dataset)
+    else:
+        # Load training data
+        train_dataset, feature_attribute_names, target_attribute_name = load_columnar_data(train_file)
+        start = record_phase('load', start)
+        # Build a decision tree
+        if workers > 1:
+            decision_tree = build_tree_parallel(train_dataset, list(range(len(feature_attribute_names))), workers)
+        else:
+            decision_tree = build_tree_columnar(train_dataset, list(range(len(feature_attribute_names))))
+        start = record_phase('build', start)
+        # Flatten the tree, then classify test data batch by batch and write results
+        compiled_tree = compile_tree(decision_tree, train_dataset)
+    start = record_phase('compile', start)
+    write_predictions(compiled_tree, train_dataset, test_file, result_file)
+    record_phase('predict', start)
+    if metrics is not None:
+        with open(metrics, 'w') as file:
+            json.dump(run_metrics, file, indent=2)
+
+
+OPTION_NAMES = ('workers', 'training', 'metrics')  # keyword arguments of main
+
+
+def parse_arguments(argv):
+    """
+        Separate the command line arguments into positional arguments and options.
+        An unknown option, or an option without a value, is reported and exits.
+
+        Parameters:
+            argv (list): Command line arguments without the program name.
+                ex. ['dt_train.txt', 'dt_test.txt', 'dt_result.txt', '--workers', '4']
+        Return:
+            (list): Positional arguments. ex. ['dt_train.txt', 'dt_test.txt', 'dt_result.txt']
+            (dict): Options as keyword arguments of main. ex. {'workers': '4'}
+    """
+    arguments = []
+    options = {}
+    i = 0
+    while i < len(argv):
+        if argv[i].startswith('--'):
+            name = argv[i][2:].replace('-', '_')
+            if name not in OPTION_NAMES:
+                print("<ERROR> Unknown option %s! (choose from %s)"
+                      % (argv[i], ", ".join('--' + option.replace('_', '-') for option in OPTION_NAMES)))
+                sys.exit(1)
+            if i + 1 >= len(argv):
+                print("<ERROR> Option %s needs a value!" % argv[i])
+                sys.exit(1)
+            options[name] = argv[i + 1]
+            i += 2
+        else:
+            arguments.append(argv[i])
+            i += 1
+    return arguments, options
 
 
 if __name__ == '__main__':
-    main(*sys.argv[1:])
+    arguments, options = parse_arguments(sys.argv[1:])
+    main(*arguments, **options)
@@ -0,0 +1,100 @@
+import sys
+import glob
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from measure import run_measured  # noqa: E402
+
+# Number of correct answers of the datasets so far: dt_answer{suffix}.txt -> count
+REFERENCE_BASELINES = {
+    '': 5,  # of 5
+    '1': 302,  # of 346
+}
+
+
+def generate_examples(train_file, test_file, num_of_examples, num_of_attributes=8, num_of_values=4, num_of_classes=3, seed=0,
+                      num_of_relevant=3):
+    """
+        Write random categorical examples into train_file (with the class) and test_file (without the class),
+        in the input format of hw2. The class depends on the first num_of_relevant attributes, with some noise,
+        so a larger num_of_relevant makes a deeper tree.
+
+        Parameters:
+            train_file (str): File name of the training data. ex. "bench_train.txt"
+            test_file (str): File name of the test data. ex. "bench_test.txt"
+            num_of_examples (int): Number of training examples. The test data has a tenth of it.
+            num_of_attributes (int): Number of feature attributes
+            num_of_values (int): Number of values of each attribute
+            num_of_classes (int): Number of classes
+            seed (int): Random seed
+            num_of_relevant (int): Number of attributes which decide the class
+    """
+    rng = random.Random(seed)
+    attribute_names = ['attr%d' % i for i in range(num_of_attributes)]
+    with open(train_file, 'w') as train, open(test_file, 'w') as test:
+        train.write('\t'.join(attribute_names + ['Class:label']) + '\n')
+        test.write('\t'.join(attribute_names) + '\n')
+        for i in range(num_of_examples):
+            values = [rng.randrange(num_of_values) for _ in range(num_of_attributes)]
+            label = sum(values[:num_of_relevant]) % num_of_classes if rng.random() < 0.9 else rng.randrange(num_of_classes)
+            row = '\t'.join('v%d' % value for value in values)
+            train.write('%s\tc%d\n' % (row, label))
+            if i % 10 == 0:
+                test.write(row + '\n')
+
+
+def run_tree(train_file, test_file, result_file, *options):
+    """
+        Run hw2 and return (wall time in seconds, peak RSS in KB).
+    """
+    script = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*_hw2.py'))[0]
+    return run_measured(script, train_file, test_file, result_file, *options)
+
+
+def check_references():
+    """
+        Run hw2 on the datasets and print the accuracy against the answers of the test program, like dt_test.exe.
+        Return True if every result has the same number of rows as its answer, and at least its baseline correct.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    all_passed = True
+    for suffix, baseline in REFERENCE_BASELINES.items():
+        run_tree(os.path.join(directory, 'datasets', 'dt_train%s.txt' % suffix),
+                 os.path.join(directory, 'datasets', 'dt_test%s.txt' % suffix), 'bench_reference.txt')
+        with open('bench_reference.txt', 'r') as file, \
+                open(os.path.join(directory, 'test program', 'dt_answer%s.txt' % suffix), 'r') as answer:
+            results = [line.split('\t')[-1].strip() for line in file][1:]
+            answers = [line.split('\t')[-1].strip() for line in answer][1:]
+        os.remove('bench_reference.txt')
+        correct = sum(1 for result, expected in zip(results, answers) if result == expected)
+        passed = len(results) == len(answers) and correct >= baseline
+        all_passed = all_passed and passed
+        print("reference\tdt_answer%s.txt\t%d/%d\t%s" % (suffix, correct, len(answers),
+                                                          'ok' if passed else 'BELOW %d' % baseline))
+    return all_passed
+
+
+def main(sizes='10000,20000,40000,80000', num_of_attributes='8', num_of_relevant='3'):
+    """
+        Print the wall time and the peak RSS of hw2 for each training data size and number of attributes,
+        after checking the accuracy on the datasets (exits with 1 if it is below the baseline).
+
+        ex. python benchmark.py 10000,100000,1000000 20,50,100 6
+    """
+    if not check_references():
+        sys.exit(1)
+    train_file, test_file, result_file = 'bench_train.txt', 'bench_test.txt', 'bench_result.txt'
+    print("examples\tattributes\tseconds\tpeak_rss_kb\tbytes_per_example")
+    for num_of_examples in (int(size) for size in sizes.split(',')):
+        for attributes in (int(count) for count in num_of_attributes.split(',')):
+            generate_examples(train_file, test_file, num_of_examples, attributes, num_of_relevant=int(num_of_relevant))
+            seconds, peak_rss = run_tree(train_file, test_file, result_file)
+            print("%d\t%d\t%.2f\t%d\t%.1f" % (num_of_examples, attributes, seconds, peak_rss,
+                                                peak_rss * 1024 / num_of_examples))
+    for filename in (train_file, test_file, result_file):
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -1,5 +1,53 @@
+import os
 import sys
 import math
+import heapq
+import json
+import struct
+import time
+import bisect
+import collections
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: the array backend then runs on the array module alone
+    np = None
+
+run_metrics = None  # {'phases': {phase: seconds}, 'counters': {name: count}}, recorded only when main gets a metrics file
+NUMPY_BLOCK_SIZE = 1 << 16  # largest (members x candidates) block of distances at once on the NumPy path
+
+
+def add_metric(name, value=1) -> None:
+    if run_metrics is not None:
+        run_metrics['counters'][name] = run_metrics['counters'].get(name, 0) + value
+
+
+def set_metric_max(name, value) -> None:
+    if run_metrics is not None:
+        run_metrics['counters'][name] = max(run_metrics['counters'].get(name, 0), value)
+
+
+def merge_metrics(counters) -> None:
+    # add the counters of a worker process to the counters of this process
+    for name, value in counters.items():
+        add_metric(name, value)
+
+
+def record_phase(phase, start) -> float:
+    # add the seconds since start to the phase, and return the time now as the start of the next phase
+    now = time.perf_counter()
+    if run_metrics is not None:
+        run_metrics['phases'][phase] = run_metrics['phases'].get(phase, 0.0) + now - start
+    return now
+
+
+def write_metrics(metrics_file) -> None:
+    if metrics_file is not None:
+        with open(metrics_file, 'w') as file:
+            json.dump(run_metrics, file, indent=2)
 
 
 def load_data(filename, label_dict) -> list:
@@ -8,9 +56,8 @@ def load_data(filename, label_dict) -> list:
         for line in file:
             elements = line.strip().split('\t')
             object_id = int(elements[0])
-            x_coord = float(elements[1])
-            y_coord = float(elements[2])
-            dataset.append((object_id, x_coord, y_coord))
+            coords = tuple(float(element) for element in elements[1:])  # (x, y) or more dimensions
+            dataset.append((object_id,) + coords)
             label_dict[object_id] = 0  # undefined
         return dataset
 
@@ -19,12 +66,212 @@ def get_distance(point1, point2) -> float:
     return math.sqrt((point1[1] - point2[1]) ** 2 + (point1[2] - point2[2]) ** 2)
 
 
-def dbscan(dataset, dist_func, eps, min_pts, label_dict) -> None:
+def get_euclidean_distance(point1, point2) -> float:
+    return math.dist(point1[1:], point2[1:])
+
+
+def get_manhattan_distance(point1, point2) -> float:
+    return sum(abs(coord1 - coord2) for coord1, coord2 in zip(point1[1:], point2[1:]))
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def get_haversine_distance(point1, point2) -> float:
+    # points are (id, latitude, longitude) in degrees, and the distance is in km
+    lat1, lon1, lat2, lon2 = map(math.radians, (point1[1], point1[2], point2[1], point2[2]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+METRICS = {
+    'euclidean': get_euclidean_distance,
+    'manhattan': get_manhattan_distance,
+    'haversine': get_haversine_distance,
+}
+
+
+class GridIndex:
+    # Uniform grid with cell size eps, so the eps-neighborhood of a point lies in its 3x3 neighboring cells
+    def __init__(self, dataset, eps):
+        if any(len(point) != 3 for point in dataset):
+            raise ValueError('GridIndex supports only 2-dimensional points')
+        self.eps = eps
+        self.cells = {}
+        for point in dataset:
+            self.cells.setdefault(self.get_cell(point), []).append(point)
+
+    def get_cell(self, point) -> tuple:
+        return math.floor(point[1] / self.eps), math.floor(point[2] / self.eps)
+
+    def range_query(self, q, eps) -> list:
+        if eps > self.eps:
+            raise ValueError(f'eps {eps} is larger than the cell size {self.eps}')
+        cell_x, cell_y = self.get_cell(q)
+        eps_squared = eps * eps  # compare squared distances to avoid sqrt
+        if run_metrics is not None:
+            add_metric('range_query_calls')
+            add_metric('distance_evaluations', sum(len(self.cells.get((x, y), ()))
+                                                   for x in range(cell_x - 1, cell_x + 2) for y in range(cell_y - 1, cell_y + 2)))
+        neighbors = []
+        for x in range(cell_x - 1, cell_x + 2):
+            for y in range(cell_y - 1, cell_y + 2):
+                for point in self.cells.get((x, y), ()):
+                    if (q[1] - point[1]) ** 2 + (q[2] - point[2]) ** 2 <= eps_squared:
+                        neighbors.append(point)
+        return neighbors
+
+
+def split_nodes(points, leaf_size) -> tuple:
+    # Sort points in place into a binary tree of ranges, splitting each range at the median of its widest axis.
+    # Return (starts, ends, lefts, rights) of the nodes. Node 0 is the root, and a leaf has left == right == -1.
+    starts, ends, lefts, rights = array('i', [0]), array('i', [len(points)]), array('i', [-1]), array('i', [-1])
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        start, end = starts[node], ends[node]
+        if end - start <= leaf_size:
+            continue
+        node_points = points[start:end]
+        spreads = [max(point[axis] for point in node_points) - min(point[axis] for point in node_points)
+                   for axis in range(1, len(points[start]))]
+        axis = 1 + spreads.index(max(spreads))
+        points[start:end] = sorted(node_points, key=lambda point: point[axis])
+        middle = (start + end) // 2
+        for child_start, child_end in ((start, middle), (middle, end)):
+            starts.append(child_start)
+            ends.append(child_end)
+            lefts.append(-1)
+            rights.append(-1)
+            stack.append(len(starts) - 1)
+        lefts[node], rights[node] = len(starts) - 2, len(starts) - 1
+    return starts, ends, lefts, rights
+
+
+class KDTree:
+    # Binary space partitioning tree with a bounding box per node, pruned by the distance from q to the box
+    def __init__(self, dataset, metric='euclidean', leaf_size=16):
+        if metric not in ('euclidean', 'manhattan'):
+            raise ValueError(f'KDTree does not support the {metric} metric')
+        self.metric = metric
+        self.dist_func = METRICS[metric]
+        self.points = list(dataset)
+        self.starts, self.ends, self.lefts, self.rights = split_nodes(self.points, leaf_size)
+        self.dim = len(self.points[0]) - 1 if self.points else 0
+        self.lower = array('d')  # lower[node * dim + axis]
+        self.upper = array('d')
+        for start, end in zip(self.starts, self.ends):
+            for axis in range(1, self.dim + 1):
+                self.lower.append(min(point[axis] for point in self.points[start:end]))
+                self.upper.append(max(point[axis] for point in self.points[start:end]))
+
+    def get_min_distance(self, q, node) -> float:
+        gaps = []
+        for axis in range(self.dim):
+            coord = q[axis + 1]
+            lower, upper = self.lower[node * self.dim + axis], self.upper[node * self.dim + axis]
+            gaps.append(lower - coord if coord < lower else coord - upper if coord > upper else 0.0)
+        if self.metric == 'euclidean':
+            return math.sqrt(sum(gap * gap for gap in gaps))
+        return sum(gaps)
+
+    def range_query(self, q, eps) -> list:
+        neighbors = []
+        evaluations = 0
+        stack = [0] if self.points else []
+        while stack:
+            node = stack.pop()
+            if self.get_min_distance(q, node) > eps:
+                continue
+            if self.lefts[node] < 0:
+                evaluations += self.ends[node] - self.starts[node]
+                for point in self.points[self.starts[node]:self.ends[node]]:
+                    if self.dist_func(q, point) <= eps:
+                        neighbors.append(point)
+            else:
+                stack.append(self.rights[node])
+                stack.append(self.lefts[node])
+        if run_metrics is not None:
+            add_metric('range_query_calls')
+            add_metric('distance_evaluations', evaluations)
+        return neighbors
+
+
+class BallTree:
+    # Tree of balls (center, radius). Every metric satisfies the triangle inequality,
+    # so a ball is skipped when dist(q, center) - radius > eps, and taken whole when dist(q, center) + radius <= eps.
+    def __init__(self, dataset, metric='euclidean', leaf_size=16):
+        self.dist_func = METRICS[metric]
+        self.points = list(dataset)
+        self.starts, self.ends, self.lefts, self.rights = split_nodes(self.points, leaf_size)
+        self.centers = []
+        self.radii = array('d')
+        for start, end in zip(self.starts, self.ends):
+            node_points = self.points[start:end]
+            center = (None,) + tuple(sum(coords) / len(node_points) for coords in zip(*node_points))[1:]
+            self.centers.append(center)
+            self.radii.append(max(self.dist_func(center, point) for point in node_points))
+
+    def range_query(self, q, eps) -> list:
+        neighbors = []
+        evaluations = 0
+        stack = [0] if self.points else []
+        while stack:
+            node = stack.pop()
+            distance = self.dist_func(q, self.centers[node])
+            evaluations += 1
+            if distance - self.radii[node] > eps:
+                continue
+            if distance + self.radii[node] <= eps:
+                neighbors.extend(self.points[self.starts[node]:self.ends[node]])
+            elif self.lefts[node] < 0:
+                evaluations += self.ends[node] - self.starts[node]
+                for point in self.points[self.starts[node]:self.ends[node]]:
+                    if self.dist_func(q, point) <= eps:
+                        neighbors.append(point)
+            else:
+                stack.append(self.rights[node])
+                stack.append(self.lefts[node])
+        if run_metrics is not None:
+            add_metric('range_query_calls')
+            add_metric('distance_evaluations', evaluations)
+        return neighbors
+
+
+def build_index(dataset, eps, index_name, metric):
+    # index_name: 'grid', 'kd-tree', 'ball-tree', 'brute' (None), or None to choose by the metric and the dimension
+    if index_name is None:
+        if metric == 'euclidean' and all(len(point) == 3 for point in dataset):
+            index_name = 'grid'
+        else:
+            index_name = 'kd-tree' if metric in ('euclidean', 'manhattan') else 'ball-tree'
+    if index_name == 'grid':
+        if metric != 'euclidean':
+            raise ValueError(f'GridIndex does not support the {metric} metric')
+        return GridIndex(dataset, eps)
+    elif index_name == 'kd-tree':
+        return KDTree(dataset, metric)
+    elif index_name == 'ball-tree':
+        return BallTree(dataset, metric)
+    elif index_name == 'brute':
+        return None
+    raise ValueError(f'Unknown index {index_name}')
+
+
+def dbscan(dataset, dist_func, eps, min_pts, label_dict, index=None) -> None:
+    # index: neighbor index with range_query(q, eps) (ex. GridIndex), otherwise every point is scanned with dist_func
+    if index is None:
+        def query(q):
+            return range_query(dataset, dist_func, q, eps)
+    else:
+        def query(q):
+            return index.range_query(q, eps)
+
     cluster_id = 0
     for point in dataset:
         if label_dict[point[0]] != 0:  # point -> (0, 84.768997, 33.368999)
             continue
-        neighbors = range_query(dataset, dist_func, point, eps)
+        neighbors = query(point)
         if len(neighbors) < min_pts:
             label_dict[point[0]] = -1  # Noise
             continue
@@ -32,6 +279,8 @@ def dbscan(dataset, dist_func, eps, min_pts, label_dict) -> None:
         label_dict[point[0]] = cluster_id
         seed_set = set(neighbors)
         seed_set.discard(point)
+        add_metric('clusters')
+        add_metric('seed_set_additions', len(seed_set))
 
         while seed_set:
             current_point = seed_set.pop()
@@ -46,13 +295,671 @@ def dbscan(dataset, dist_func, eps, min_pts, label_dict) -> None:
             label_dict[current_id] = cluster_id
 
             # Expand cluster with neighbors if condition meets
-            current_neighbors = range_query(dataset, dist_func, current_point, eps)
+            current_neighbors = query(current_point)
             if len(current_neighbors) >= min_pts:
                 new_points = {tuple(n) for n in current_neighbors if label_dict[n[0]] <= 0}
                 seed_set.update(new_points)
+                if run_metrics is not None:
+                    add_metric('seed_set_additions', len(new_points))
+                    set_metric_max('seed_set_max', len(seed_set))
+
+
+def load_array_data(filename) -> tuple:
+    # ids in array('i') and coordinates flattened row by row in array('d'), instead of a tuple per point
+    ids = array('i')
+    coords = array('d')
+    dim = 0
+    with open(filename, 'r') as file:
+        for line in file:
+            elements = line.strip().split('\t')
+            ids.append(int(elements[0]))
+            coords.extend(float(element) for element in elements[1:])
+            dim = len(elements) - 1
+    return ids, coords, dim
+
+
+def iterate_neighbors(coords, dim, eps, metric='euclidean'):
+    # Yield (i, neighbors of point i as an array, including i itself) for every point, cell by cell.
+    # Points are bucketed into cells of size eps, so every neighbor lies in the 3^dim cells around a point.
+    # The candidates are gathered once per cell and shared by all the points in it, and only one cell is held at a time.
+    if metric not in ('euclidean', 'manhattan'):
+        raise ValueError(f'The array backend does not support the {metric} metric')
+    n = len(coords) // dim if dim else 0  # dim is 0 for an empty input
+    cells = {}  # cell -> (point indices, one coordinate column per dimension)
+    for i in range(n):
+        point = coords[i * dim:(i + 1) * dim]
+        cell = tuple(math.floor(value / eps) for value in point)
+        if cell not in cells:
+            cells[cell] = (array('i'), [array('d') for _ in range(dim)])
+        cells[cell][0].append(i)
+        for column, value in zip(cells[cell][1], point):
+            column.append(value)
+    adjacent_offsets = list(itertools.product((-1, 0, 1), repeat=dim))
+
+    eps_squared = eps * eps
+    for cell, (members, member_columns) in cells.items():
+        candidates = array('i')
+        candidate_columns = [array('d') for _ in range(dim)]
+        for adjacent_offset in adjacent_offsets:
+            adjacent = cells.get(tuple(c + o for c, o in zip(cell, adjacent_offset)))
+            if adjacent is not None:
+                candidates.extend(adjacent[0])
+                for candidate_column, column in zip(candidate_columns, adjacent[1]):
+                    candidate_column.extend(column)
+        if run_metrics is not None:
+            add_metric('range_query_calls', len(members))
+            add_metric('distance_evaluations', len(members) * len(candidates))
+
+        for k, i in enumerate(members):
+            if dim == 2 and metric == 'euclidean':  # the common case, unrolled
+                x, y = member_columns[0][k], member_columns[1][k]
+                yield i, array('i', (j for j, px, py in zip(candidates, *candidate_columns)
+                                     if (px - x) * (px - x) + (py - y) * (py - y) <= eps_squared))
+            elif metric == 'euclidean':
+                q = [column[k] for column in member_columns]
+                yield i, array('i', (j for j, p in zip(candidates, zip(*candidate_columns)) if math.dist(q, p) <= eps))
+            else:
+                q = [column[k] for column in member_columns]
+                yield i, array('i', (j for j, p in zip(candidates, zip(*candidate_columns))
+                                     if sum(abs(a - b) for a, b in zip(q, p)) <= eps))
+
+
+def build_neighbor_lists(coords, dim, eps, metric='euclidean') -> tuple:
+    # CSR neighbor lists: the neighbors of point i are indices[starts[i]:starts[i] + counts[i]] (including i itself)
+    n = len(coords) // dim if dim else 0  # dim is 0 for an empty input
+    starts = array('q', bytes(8 * n))
+    counts = array('i', bytes(4 * n))
+    indices = array('i')
+    for i, neighbors in iterate_neighbors(coords, dim, eps, metric):
+        starts[i] = len(indices)
+        counts[i] = len(neighbors)
+        indices.extend(neighbors)
+    return starts, counts, indices
+
+
+def find_root(parents, node):
+    while parents[node] != node:
+        parents[node] = parents[parents[node]]  # path halving
+        node = parents[node]
+    return node
+
+
+def dbscan_array(coords, dim, eps, min_pts, metric='euclidean') -> tuple:
+    # DBSCAN over point indices in one pass over the neighborhoods, without keeping those of the core points.
+    # Two core points within eps are joined (union-find) when the later of them is visited, and a non-core point
+    # keeps its neighbors (fewer than min_pts) until the clusters are known.
+    # Return (labels, counts): labels[i] is -1 (noise) or the cluster id, and counts[i] is the size of the neighborhood.
+    # The labels are the same as expanding the clusters from the points in the input order: the clusters are
+    # numbered by their first core point, and a border point goes to the first cluster reaching it.
+    # With NumPy installed, dbscan_numpy computes the same labels.
+    if np is not None:
+        return dbscan_numpy(coords, dim, eps, min_pts, metric)
+    n = len(coords) // dim if dim else 0  # dim is 0 for an empty input
+    counts = array('i', bytes(4 * n))  # 0 until the point is visited
+    parents = array('i', range(n))
+    border_neighbors = {}  # non-core point -> its neighbors
+    for i, neighbors in iterate_neighbors(coords, dim, eps, metric):
+        counts[i] = len(neighbors)
+        if counts[i] < min_pts:
+            border_neighbors[i] = neighbors
+            continue
+        for j in neighbors:
+            if j != i and counts[j] >= min_pts:
+                root_i, root_j = find_root(parents, i), find_root(parents, j)
+                if root_i != root_j:  # the root of a cluster is its first core point
+                    parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    labels = array('i', bytes(4 * n))
+    cluster_id = 0
+    for i in range(n):
+        if counts[i] < min_pts:
+            continue
+        root = find_root(parents, i)
+        if root == i:
+            cluster_id += 1
+            labels[i] = cluster_id
+            add_metric('clusters')
+        else:
+            labels[i] = labels[root]
+    for i, neighbors in border_neighbors.items():
+        labels[i] = min((labels[j] for j in neighbors if counts[j] >= min_pts), default=-1)
+    return labels, counts
+
+
+def get_within_eps(members, candidates, eps, metric):
+    # (members x candidates) booleans of the pairs within eps, with the same arithmetic as iterate_neighbors
+    if metric == 'euclidean':
+        total = np.square(candidates[:, 0] - members[:, 0:1])
+        for k in range(1, members.shape[1]):
+            total += np.square(candidates[:, k] - members[:, k:k + 1])
+        return total <= eps * eps
+    total = np.abs(candidates[:, 0] - members[:, 0:1])
+    for k in range(1, members.shape[1]):
+        total += np.abs(candidates[:, k] - members[:, k:k + 1])
+    return total <= eps
+
+
+def iterate_blocks(members, candidates, points, eps, metric):
+    # Yield (row offset, within-eps booleans) for the members in chunks of at most NUMPY_BLOCK_SIZE distances
+    chunk = max(1, NUMPY_BLOCK_SIZE // max(1, len(candidates)))
+    candidate_points = points[candidates]
+    for offset in range(0, len(members), chunk):
+        yield offset, get_within_eps(points[members[offset:offset + chunk]], candidate_points, eps, metric)
+
+
+def dbscan_numpy(coords, dim, eps, min_pts, metric='euclidean') -> tuple:
+    # dbscan_array with the distances computed by NumPy, in blocks of at most NUMPY_BLOCK_SIZE.
+    # The points are sorted by fine cells of side eps / k, small enough that the points of a fine cell are all within
+    # eps of each other. k x k fine cells make a coarse cell of side eps, so every neighbor is in the 3^dim adjacent
+    # coarse cells. Each coarse cell is a block of (its points) x (the points of the adjacent cells), visited 3 times:
+    # 1. the size of each neighborhood
+    # 2. the pairs of fine cells with two core points within eps, from the block of core points reduced by fine cell.
+    #    The core points of a fine cell are connected, so the clusters are the connected fine cells.
+    # 3. a non-core point goes to the first (smallest) cluster among its core neighbors
+    if metric not in ('euclidean', 'manhattan'):
+        raise ValueError(f'The array backend does not support the {metric} metric')
+    n = len(coords) // dim if dim else 0
+    labels = np.full(n, -1, dtype=np.intc)
+    counts = np.zeros(n, dtype=np.intc)
+    if n > 0:
+        k = math.isqrt(dim) + 1 if metric == 'euclidean' else dim + 1  # the diagonal of a fine cell is below eps
+        fine_cells = np.floor(np.frombuffer(coords, dtype=np.float64).reshape(n, dim) * (k / eps)).astype(np.int64)
+        coarse_cells = fine_cells // k
+        order = np.lexsort([fine_cells[:, d] for d in reversed(range(dim))]
+                           + [coarse_cells[:, d] for d in reversed(range(dim))])
+        points = np.frombuffer(coords, dtype=np.float64).reshape(n, dim)[order]
+        fine_cells, coarse_cells = fine_cells[order], coarse_cells[order]
+        # fine cell number of each sorted point, and the range of each coarse cell in the sorted points
+        fine_ids = np.cumsum(np.any(fine_cells[1:] != fine_cells[:-1], axis=1), dtype=np.int64)
+        fine_ids = np.concatenate(([0], fine_ids))
+        coarse_starts = np.flatnonzero(np.concatenate(([True], np.any(coarse_cells[1:] != coarse_cells[:-1], axis=1))))
+        coarse_ends = np.append(coarse_starts[1:], n)
+        cells = dict(zip(map(tuple, coarse_cells[coarse_starts].tolist()), zip(coarse_starts.tolist(), coarse_ends.tolist())))
+        adjacent_offsets = list(itertools.product((-1, 0, 1), repeat=dim))
+
+        def get_candidates(cell):
+            ranges = [cells.get(tuple(c + o for c, o in zip(cell, adjacent_offset))) for adjacent_offset in adjacent_offsets]
+            return np.concatenate([np.arange(start, end) for start, end in filter(None, ranges)])
+
+        sorted_counts = np.zeros(n, dtype=np.intc)
+        for cell, (start, end) in cells.items():
+            members, candidates = np.arange(start, end), get_candidates(cell)
+            add_metric('range_query_calls', len(members))
+            add_metric('distance_evaluations', len(members) * len(candidates))
+            for offset, within in iterate_blocks(members, candidates, points, eps, metric):
+                sorted_counts[start + offset:start + offset + len(within)] = within.sum(axis=1)
+        is_core = sorted_counts >= min_pts
+
+        edges = []  # arrays of (fine cell, fine cell) with two core points within eps
+        for cell, (start, end) in cells.items():
+            members = np.arange(start, end)[is_core[start:end]]
+            if len(members) == 0:
+                continue
+            candidates = get_candidates(cell)
+            candidates = candidates[is_core[candidates]]
+            column_fine_ids = fine_ids[candidates]
+            column_starts = np.flatnonzero(np.concatenate(([True], column_fine_ids[1:] != column_fine_ids[:-1])))
+            cell_edges = []
+            for offset, within in iterate_blocks(members, candidates, points, eps, metric):
+                row_fine_ids = fine_ids[members[offset:offset + len(within)]]
+                row_starts = np.flatnonzero(np.concatenate(([True], row_fine_ids[1:] != row_fine_ids[:-1])))
+                reduced = np.logical_or.reduceat(np.logical_or.reduceat(within, column_starts, axis=1), row_starts, axis=0)
+                rows, columns = np.nonzero(reduced)
+                cell_edges.append(np.stack((row_fine_ids[row_starts][rows], column_fine_ids[column_starts][columns])))
+            cell_edges = np.concatenate(cell_edges, axis=1)
+            cell_edges = cell_edges[:, cell_edges[0] < cell_edges[1]]  # each pair is found from both of its cells
+            if cell_edges.shape[1] > 0:
+                edges.append(np.unique(cell_edges, axis=1))
+
+        # connected fine cells: hook the larger root to the smaller one, then jump the pointers, until every edge is inside
+        parents = np.arange(fine_ids[-1] + 1)
+        if edges:
+            sources, targets = np.unique(np.concatenate(edges, axis=1), axis=1)
+            while True:
+                source_roots, target_roots = parents[sources], parents[targets]
+                if np.array_equal(source_roots, target_roots):
+                    break
+                np.minimum.at(parents, np.maximum(source_roots, target_roots), np.minimum(source_roots, target_roots))
+                while True:
+                    grandparents = parents[parents]
+                    if np.array_equal(grandparents, parents):
+                        break
+                    parents = grandparents
+
+        # number the clusters by their first core point in the input order
+        core_positions = np.flatnonzero(is_core)
+        sorted_labels = np.full(n, -1, dtype=np.intc)
+        if len(core_positions) > 0:
+            core_roots = parents[fine_ids[core_positions]]
+            first_points = np.full(len(parents), n, dtype=np.int64)
+            np.minimum.at(first_points, core_roots, order[core_positions])
+            roots = np.unique(core_roots)
+            cluster_ids = np.zeros(len(parents), dtype=np.intc)
+            cluster_ids[roots[np.argsort(first_points[roots])]] = np.arange(1, len(roots) + 1)
+            sorted_labels[core_positions] = cluster_ids[core_roots]
+            add_metric('clusters', len(roots))
+
+            for cell, (start, end) in cells.items():
+                members = np.arange(start, end)[~is_core[start:end]]
+                if len(members) == 0:
+                    continue
+                candidates = get_candidates(cell)
+                candidates = candidates[is_core[candidates]]
+                if len(candidates) == 0:
+                    continue
+                candidate_labels = sorted_labels[candidates]
+                for offset, within in iterate_blocks(members, candidates, points, eps, metric):
+                    first_labels = np.where(within, candidate_labels, np.iinfo(np.intc).max).min(axis=1)
+                    sorted_labels[members[offset:offset + len(within)]] = np.where(within.any(axis=1), first_labels, -1)
+        labels[order] = sorted_labels
+        counts[order] = sorted_counts
+    return array('i', labels.tobytes()), array('i', counts.tobytes())
+
+
+def dbscan_tile_task(coords, dim, eps, min_pts, metric, record_metrics=False) -> tuple:
+    # Local DBSCAN of one tile (its own points and the halo), run in a worker process.
+    # Return (labels, counts, the counters of the worker or None); the clusters of the tile count as local_clusters.
+    global run_metrics
+    run_metrics = {'phases': {}, 'counters': {}} if record_metrics else None
+    labels, counts = dbscan_array(coords, dim, eps, min_pts, metric)
+    if run_metrics is not None and 'clusters' in run_metrics['counters']:
+        run_metrics['counters']['local_clusters'] = run_metrics['counters'].pop('clusters')
+    return labels, counts, run_metrics and run_metrics['counters']
+
+
+def dbscan_parallel(coords, dim, eps, min_pts, metric='euclidean', workers=2) -> array:
+    # The points are split into strips of equal size along the first coordinate. Each tile is a strip with the
+    # points within eps of it (the halo), so the neighborhoods of its own points are complete and their core flags
+    # are exact. Halo points may only look less dense, so every local core point is a real core point.
+    if metric not in ('euclidean', 'manhattan'):
+        raise ValueError(f'The parallel mode does not support the {metric} metric')
+    n = len(coords) // dim if dim else 0  # dim is 0 for an empty input
+    order = sorted(range(n), key=lambda i: coords[i * dim])
+    xs = [coords[i * dim] for i in order]
+    num_of_tiles = max(1, min(workers, n))
+    tiles = []  # global point indices of each tile
+    owners = array('i', bytes(4 * n))
+    for t in range(num_of_tiles):
+        own_start, own_end = t * n // num_of_tiles, (t + 1) * n // num_of_tiles
+        for i in order[own_start:own_end]:
+            owners[i] = t
+        if own_start == own_end:
+            tiles.append([])
+            continue
+        tile_start = bisect.bisect_left(xs, xs[own_start] - eps)
+        tile_end = bisect.bisect_right(xs, xs[own_end - 1] + eps)
+        tiles.append(sorted(order[tile_start:tile_end]))  # keep the input order inside a tile
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(dbscan_tile_task, array('d', (coords[i * dim + k] for i in members for k in range(dim))),
+                                   dim, eps, min_pts, metric, run_metrics is not None) for members in tiles]
+        results = []
+        for future in futures:
+            labels, counts, counters = future.result()
+            if counters is not None:
+                merge_metrics(counters)
+            results.append((labels, counts))
+
+    # Label and core flag of each point in the tile owning it
+    owner_labels = array('i', bytes(4 * n))
+    is_core = bytearray(n)
+    for t, (members, (labels, counts)) in enumerate(zip(tiles, results)):
+        for k, i in enumerate(members):
+            if owners[i] == t:
+                owner_labels[i] = labels[k]
+                is_core[i] = counts[k] >= min_pts
+
+    # Union-find over the local clusters (tile, local cluster id): two local clusters sharing a core point are one
+    parents = {}
+    other_labels = {}  # noise in the owner tile, but a border point of a cluster in another tile
+    for t, (members, (labels, counts)) in enumerate(zip(tiles, results)):
+        for k, i in enumerate(members):
+            if labels[k] <= 0:
+                continue
+            node = (t, labels[k])
+            parents.setdefault(node, node)
+            if owners[i] == t:
+                continue
+            if is_core[i]:
+                owner_node = (owners[i], owner_labels[i])
+                parents.setdefault(owner_node, owner_node)
+                parents[find_root(parents, node)] = find_root(parents, owner_node)
+            elif owner_labels[i] == -1:
+                other_labels.setdefault(i, node)
+
+    # Renumber the merged clusters in the input order
+    cluster_ids = {}
+    labels = array('i', bytes(4 * n))
+    for i in range(n):
+        if owner_labels[i] > 0:
+            node = (owners[i], owner_labels[i])
+        elif i in other_labels:
+            node = other_labels[i]
+        else:
+            labels[i] = -1  # Noise
+            continue
+        root = find_root(parents, node)
+        if root not in cluster_ids:
+            cluster_ids[root] = len(cluster_ids) + 1
+            add_metric('clusters')
+        labels[i] = cluster_ids[root]
+    return labels
+
+
+def get_array_distance(coords, dim, i, j, metric) -> float:
+    p, q = coords[i * dim:(i + 1) * dim], coords[j * dim:(j + 1) * dim]
+    if metric == 'euclidean':
+        return math.dist(p, q)
+    return sum(abs(a - b) for a, b in zip(p, q))
+
+
+def optics(coords, dim, eps, min_pts, metric='euclidean') -> tuple:
+    # Reachability ordering of the points at the maximum eps, from which a DBSCAN clustering for any eps' <= eps
+    # can be extracted. core_distances[i] is the distance to the min_pts-th nearest point (itself included),
+    # so a point is a core point at eps' exactly when core_distances[i] <= eps'.
+    # border_cores[i] is the core point that reaches i at the smallest eps (border_distances[i]), which places
+    # the border points that come before all their core points in the ordering.
+    starts, counts, indices = build_neighbor_lists(coords, dim, eps, metric)
+    n = len(counts)
+    order = array('i')
+    reachability = array('d', [math.inf]) * n
+    core_distances = array('d', [math.inf]) * n
+    border_distances = array('d', [math.inf]) * n
+    border_cores = array('i', [-1]) * n
+    processed = bytearray(n)
+    for point in range(n):
+        if processed[point]:
+            continue
+        heap = [(math.inf, point)]  # (reachability, point), stale entries are skipped when popped
+        while heap:
+            current_reachability, current = heapq.heappop(heap)
+            if processed[current] or current_reachability > reachability[current]:
+                continue
+            processed[current] = 1
+            order.append(current)
+            if counts[current] < min_pts:
+                continue
+            neighbors = indices[starts[current]:starts[current] + counts[current]]
+            distances = [get_array_distance(coords, dim, current, neighbor, metric) for neighbor in neighbors]
+            core_distance = heapq.nsmallest(min_pts, distances)[-1]
+            core_distances[current] = core_distance
+            for neighbor, distance in zip(neighbors, distances):
+                new_reachability = max(core_distance, distance)
+                if new_reachability < border_distances[neighbor]:
+                    border_distances[neighbor] = new_reachability
+                    border_cores[neighbor] = current
+                if not processed[neighbor] and new_reachability < reachability[neighbor]:
+                    reachability[neighbor] = new_reachability
+                    heapq.heappush(heap, (new_reachability, neighbor))
+    return order, reachability, core_distances, border_distances, border_cores
+
+
+def extract_dbscan(order, reachability, core_distances, border_distances, border_cores, eps) -> array:
+    # ExtractDBSCAN: the labels of DBSCAN(eps, min_pts) for eps <= the ordering eps, in linear time
+    labels = array('i', bytes(4 * len(order)))
+    cluster_id = 0
+    for point in order:  # core points, a new cluster starts where the reachability jumps over eps
+        if core_distances[point] <= eps:
+            if reachability[point] > eps:
+                cluster_id += 1
+            labels[point] = cluster_id
+    for point in order:  # border points join the cluster of the core point reaching them, the rest is noise
+        if core_distances[point] > eps:
+            labels[point] = labels[border_cores[point]] if border_distances[point] <= eps else -1
+    return labels
+
+
+OPTICS_MAGIC = b'HW3OPTI\x00'  # first 8 bytes of a cached ordering file
+OPTICS_HEADER = struct.Struct('=8sqqd16sqq')  # magic, input file size, input file mtime (ns), eps, metric, min_pts, number of points
+
+
+def write_optics_cache(cache_file_name, input_file_name, eps, metric, min_pts, ids, ordering):
+    # ordering: (order, reachability, core_distances, border_distances, border_cores) of optics
+    input_stat = os.stat(input_file_name)
+    with open(cache_file_name, 'wb') as file:
+        file.write(OPTICS_HEADER.pack(OPTICS_MAGIC, input_stat.st_size, input_stat.st_mtime_ns, eps,
+                                      metric.encode(), min_pts, len(ids)))
+        for values in (ids,) + ordering:
+            values.tofile(file)
+
+
+def load_optics_cache(cache_file_name, input_file_name, eps, metric, min_pts):
+    # Returns (ids, ordering), or None if the cache is missing, stale, or was built for
+    # other parameters or a smaller eps
+    if not os.path.exists(cache_file_name) or os.path.getsize(cache_file_name) < OPTICS_HEADER.size:
+        return None
+    with open(cache_file_name, 'rb') as file:
+        magic, input_size, input_mtime, cached_eps, cached_metric, cached_min_pts, n = \
+            OPTICS_HEADER.unpack(file.read(OPTICS_HEADER.size))
+        input_stat = os.stat(input_file_name)
+        if (magic != OPTICS_MAGIC or (input_size, input_mtime) != (input_stat.st_size, input_stat.st_mtime_ns)
+                or cached_metric.rstrip(b'\x00') != metric.encode() or cached_min_pts != min_pts or cached_eps < eps):
+            return None
+        ids = array('i')
+        ordering = (array('i'), array('d'), array('d'), array('d'), array('i'))
+        for values in (ids,) + ordering:
+            values.fromfile(file, n)
+        return ids, ordering
+
+
+class IncrementalDBSCAN:
+    # IncrementalDBSCAN (Ester et al.): labels, neighbor counts (core flags are counts >= min_pts) and a grid of
+    # cell size eps are kept, so an insert or a delete only looks at the eps-neighborhoods around the point.
+    # labels: -1 (noise) or the cluster id
+    def __init__(self, eps, min_pts, metric='euclidean'):
+        if metric not in ('euclidean', 'manhattan'):
+            raise ValueError(f'IncrementalDBSCAN does not support the {metric} metric')
+        self.eps = eps
+        self.min_pts = min_pts
+        self.metric = metric
+        self.dist_func = METRICS[metric]
+        self.points = {}  # id -> (id, x, y, ...)
+        self.labels = {}
+        self.counts = {}  # number of points within eps, itself included
+        self.cells = {}  # cell -> ids
+        self.members = {}  # cluster id -> ids
+        self.next_cluster_id = 1
+
+    def get_cell(self, point) -> tuple:
+        return tuple(math.floor(value / self.eps) for value in point[1:])
+
+    def range_query(self, point) -> list:
+        neighbors = []
+        evaluations = 0
+        for offset in itertools.product((-1, 0, 1), repeat=len(point) - 1):
+            cell = tuple(c + o for c, o in zip(self.get_cell(point), offset))
+            cell_ids = self.cells.get(cell, ())
+            evaluations += len(cell_ids)
+            for object_id in cell_ids:
+                if self.dist_func(point, self.points[object_id]) <= self.eps:
+                    neighbors.append(object_id)
+        if run_metrics is not None:
+            add_metric('range_query_calls')
+            add_metric('distance_evaluations', evaluations)
+        return neighbors
+
+    def is_core(self, object_id) -> bool:
+        return self.counts[object_id] >= self.min_pts
+
+    def set_label(self, object_id, cluster_id):
+        old_cluster_id = self.labels.get(object_id, -1)
+        if old_cluster_id > 0:
+            self.members[old_cluster_id].discard(object_id)
+            if not self.members[old_cluster_id]:
+                del self.members[old_cluster_id]
+        if cluster_id > 0:
+            self.members.setdefault(cluster_id, set()).add(object_id)
+        self.labels[object_id] = cluster_id
+
+    def new_cluster_id(self) -> int:
+        self.next_cluster_id += 1
+        return self.next_cluster_id - 1
+
+    def label_non_core(self, object_id):
+        # A non-core point joins the cluster of a core point within eps (border), otherwise it is noise
+        for neighbor in self.range_query(self.points[object_id]):
+            if neighbor != object_id and self.is_core(neighbor):
+                self.set_label(object_id, self.labels[neighbor])
+                return
+        self.set_label(object_id, -1)
+
+    def insert(self, point):
+        object_id = point[0]
+        if object_id in self.points:
+            raise ValueError(f'Point {object_id} already exists')
+        self.points[object_id] = point
+        self.cells.setdefault(self.get_cell(point), set()).add(object_id)
+        neighbors = self.range_query(point)
+        self.counts[object_id] = len(neighbors)
+        for neighbor in neighbors:
+            if neighbor != object_id:
+                self.counts[neighbor] += 1
+        new_cores = [neighbor for neighbor in neighbors if self.counts[neighbor] == self.min_pts
+                     or (neighbor == object_id and self.is_core(neighbor))]
+        if not new_cores:
+            self.label_non_core(object_id)
+            return
+
+        # Group the new core points with union-find, linked to each other and to the clusters of old core points
+        # within eps of them. Each group creates a cluster, is absorbed into one, or merges several.
+        parents = {core: core for core in new_cores}
+        core_neighbors = {core: self.range_query(self.points[core]) for core in new_cores}
+        for core in new_cores:
+            for neighbor in core_neighbors[core]:
+                if neighbor in parents:
+                    parents[find_root(parents, core)] = find_root(parents, neighbor)
+                elif self.is_core(neighbor):
+                    cluster_node = ('cluster', self.labels[neighbor])
+                    parents.setdefault(cluster_node, cluster_node)
+                    parents[find_root(parents, core)] = find_root(parents, cluster_node)
+
+        groups = {}  # root -> (new core ids, old cluster ids)
+        for node in parents:
+            cores, cluster_ids = groups.setdefault(find_root(parents, node), ([], []))
+            if isinstance(node, tuple):
+                cluster_ids.append(node[1])
+            else:
+                cores.append(node)
+        for cores, cluster_ids in groups.values():
+            if not cluster_ids:  # creation
+                cluster_id = self.new_cluster_id()
+            else:  # absorption, or a merge into the largest cluster
+                cluster_ids.sort(key=lambda cluster_id: -len(self.members[cluster_id]))
+                cluster_id = cluster_ids[0]
+                for other_cluster_id in cluster_ids[1:]:
+                    for member in list(self.members[other_cluster_id]):
+                        self.set_label(member, cluster_id)
+            for core in cores:
+                self.set_label(core, cluster_id)
+                for neighbor in core_neighbors[core]:
+                    if not self.is_core(neighbor):
+                        self.set_label(neighbor, cluster_id)
+
+    def delete(self, object_id):
+        if object_id not in self.points:
+            raise ValueError(f'Point {object_id} does not exist')
+        point = self.points[object_id]
+        neighbors = self.range_query(point)
+        was_core = self.is_core(object_id)
+        self.set_label(object_id, -1)
+        del self.points[object_id], self.labels[object_id], self.counts[object_id]
+        self.cells[self.get_cell(point)].discard(object_id)
+        neighbors.remove(object_id)
+        for neighbor in neighbors:
+            self.counts[neighbor] -= 1
+        lost_cores = [neighbor for neighbor in neighbors if self.counts[neighbor] == self.min_pts - 1]
+        if not was_core and not lost_cores:
+            return
+
+        # Remaining core points within eps of a lost core, grouped by their cluster, may now be disconnected
+        affected = set(neighbors)
+        seeds = {}  # cluster id -> core ids
+        for lost_core in lost_cores:
+            lost_core_neighbors = self.range_query(self.points[lost_core])
+            affected.update(lost_core_neighbors)
+            for neighbor in lost_core_neighbors:
+                if self.is_core(neighbor):
+                    seeds.setdefault(self.labels[neighbor], set()).add(neighbor)
+        for neighbor in neighbors:
+            if self.is_core(neighbor):
+                seeds.setdefault(self.labels[neighbor], set()).add(neighbor)
+
+        for cluster_id, cluster_seeds in seeds.items():
+            # The component of the first seed keeps the cluster id, and every other component is split off
+            remaining_seeds = set(cluster_seeds)
+            first = True
+            while remaining_seeds:
+                seed = remaining_seeds.pop()
+                component = {seed}
+                queue = collections.deque([seed])  # breadth-first, so the nearby seeds are found early
+                while queue and (not first or remaining_seeds):
+                    current = queue.popleft()
+                    for neighbor in self.range_query(self.points[current]):
+                        if neighbor not in component and self.is_core(neighbor):
+                            component.add(neighbor)
+                            remaining_seeds.discard(neighbor)
+                            queue.append(neighbor)
+                if not first:  # split
+                    new_cluster_id = self.new_cluster_id()
+                    for core in component:
+                        self.set_label(core, new_cluster_id)
+                        affected.update(self.range_query(self.points[core]))
+                first = False
+
+        for neighbor in affected:
+            if not self.is_core(neighbor):
+                self.label_non_core(neighbor)
+
+    def get_label_dict(self) -> dict:
+        return dict(self.labels)
+
+
+def build_incremental_dbscan(input_data_file_name, eps, min_pts, metric) -> IncrementalDBSCAN:
+    # The first state is clustered at once on the array backend
+    engine = IncrementalDBSCAN(eps, min_pts, metric)
+    ids, coords, dim = load_array_data(input_data_file_name)
+    labels, counts = dbscan_array(coords, dim, eps, min_pts, metric)
+    for i, object_id in enumerate(ids):
+        point = (object_id,) + tuple(coords[i * dim:(i + 1) * dim])
+        engine.points[object_id] = point
+        engine.cells.setdefault(engine.get_cell(point), set()).add(object_id)
+        engine.counts[object_id] = counts[i]
+        engine.set_label(object_id, labels[i])
+    engine.next_cluster_id = max(labels, default=0) + 1
+    return engine
+
+
+def save_incremental_dbscan(engine, state_file_name):
+    # ex. {"eps": 15.0, "min_pts": 22, "metric": "euclidean", "next_cluster_id": 9,
+    #      "points": [[0, 84.768997, 33.368999, 1, 31], ...]}  (id, coordinates, label, count)
+    with open(state_file_name, 'w') as file:
+        json.dump({
+            'eps': engine.eps,
+            'min_pts': engine.min_pts,
+            'metric': engine.metric,
+            'next_cluster_id': engine.next_cluster_id,
+            'points': [list(point) + [engine.labels[object_id], engine.counts[object_id]]
+                       for object_id, point in engine.points.items()],
+        }, file)
+
+
+def load_incremental_dbscan(state_file_name) -> IncrementalDBSCAN:
+    with open(state_file_name, 'r') as file:
+        state = json.load(file)
+    engine = IncrementalDBSCAN(state['eps'], state['min_pts'], state['metric'])
+    for values in state['points']:
+        point = tuple(values[:-2])
+        engine.points[point[0]] = point
+        engine.cells.setdefault(engine.get_cell(point), set()).add(point[0])
+        engine.counts[point[0]] = values[-1]
+        engine.set_label(point[0], values[-2])
+    engine.next_cluster_id = state['next_cluster_id']
+    return engine
 
 
 def range_query(labeled_dataset, dist_func, q, eps) -> list:
+    add_metric('range_query_calls')
+    add_metric('distance_evaluations', len(labeled_dataset))
     neighbors = set()
     for point in labeled_dataset:
         if dist_func(q, point) <= eps:
@@ -67,7 +974,7 @@ def group_by_cluster(label_dict) -> dict:
             cluster_groups[cluster_id].append(object_id)
         else:
             cluster_groups[cluster_id] = [object_id]
-    del cluster_groups[-1]
+    cluster_groups.pop(-1, None)  # Noise
     return cluster_groups
 
 
@@ -83,22 +990,132 @@ def write_clusters(sorted_n_groups, output_prefix) -> None:
                 f.write(f'{obj_id}\n')
 
 
-def main(input_data_file_name, n, eps, min_pts):
+def main(input_data_file_name, n, eps, min_pts, index=None, metric='euclidean', backend='tuple', workers=1,
+         extract=None, optics_cache=None, state=None, insert=None, delete=None, metrics=None):
+    # backend: 'tuple' (a tuple per point and a label_dict) or 'array' (flat arrays, neighborhoods visited cell by cell).
+    #          The array backend computes the distances in blocks with NumPy if it is installed, which is much faster
+    #          on large inputs. Without NumPy it is about as fast as the tuple backend with the grid index.
+    # workers: with more than 1, the points are clustered in spatial tiles in parallel (on the array backend)
+    # extract: eps values separated by commas (ex. '10,12.5,15'), each at most eps. The reachability ordering is
+    #          computed once at eps (or loaded from optics_cache) and a clustering is extracted for each value.
+    # state: file of the incremental mode. It is built from the input at first, and then the points of the insert
+    #        file (same format as the input) are added and the points whose ids are in the delete file are removed.
+    # metrics: file to write the seconds of each phase and the work counters (ex. range_query_calls) into, as JSON
+    global run_metrics
+    if metrics is not None:
+        run_metrics = {'phases': {}, 'counters': {}}
+    start = time.perf_counter()
     n = int(n)
     eps = float(eps)
     min_pts = int(min_pts)
+    workers = int(workers)
+    if metric not in METRICS:
+        raise ValueError(f'Unknown metric {metric} (choose from {", ".join(METRICS)})')
 
-    label_dict = {}
+    output_prefix = input_data_file_name.replace('.txt', '')
+
+    if state is not None:
+        if os.path.exists(state):
+            engine = load_incremental_dbscan(state)
+            if (engine.eps, engine.min_pts, engine.metric) != (eps, min_pts, metric):
+                raise ValueError(f'eps, min_pts and metric should be {engine.eps}, {engine.min_pts}, {engine.metric} '
+                                 f'as in the state')
+        else:
+            engine = build_incremental_dbscan(input_data_file_name, eps, min_pts, metric)
+        start = record_phase('load', start)
+        if delete is not None:
+            with open(delete, 'r') as file:
+                for line in file:
+                    if line.strip():
+                        engine.delete(int(line.strip().split('\t')[0]))
+        if insert is not None:
+            for point in load_data(insert, {}):
+                engine.insert(point)
+        start = record_phase('update', start)
+        save_incremental_dbscan(engine, state)
+        write_clusters(sort_n_groups_by_size(group_by_cluster(engine.get_label_dict()), n), output_prefix)
+        record_phase('write', start)
+        write_metrics(metrics)
+        return
 
-    dataset = load_data(input_data_file_name, label_dict)
-    dbscan(dataset, get_distance, eps, min_pts, label_dict)
+    if extract is not None:
+        eps_values = [float(value) for value in extract.split(',')]
+        if max(eps_values) > eps:
+            raise ValueError(f'Extracted eps {max(eps_values)} is larger than the ordering eps {eps}')
+        if optics_cache is None:
+            optics_cache = f'{output_prefix}_optics_{min_pts}.bin'
+        cached = load_optics_cache(optics_cache, input_data_file_name, eps, metric, min_pts)
+        if cached is None:
+            ids, coords, dim = load_array_data(input_data_file_name)
+            ordering = optics(coords, dim, eps, min_pts, metric)
+            write_optics_cache(optics_cache, input_data_file_name, eps, metric, min_pts, ids, ordering)
+        else:
+            ids, ordering = cached
+        start = record_phase('ordering', start)
+        for extract_eps in eps_values:
+            label_dict = dict(zip(ids, extract_dbscan(*ordering, extract_eps)))
+            sorted_n_groups = sort_n_groups_by_size(group_by_cluster(label_dict), n)
+            # ex. input1_eps12.5_cluster_0.txt, or input1_cluster_0.txt for a single eps
+            write_clusters(sorted_n_groups, output_prefix if len(eps_values) == 1 else f'{output_prefix}_eps{extract_eps:g}')
+        record_phase('extract', start)
+        write_metrics(metrics)
+        return
+
+    if workers > 1:
+        ids, coords, dim = load_array_data(input_data_file_name)
+        start = record_phase('load', start)
+        label_dict = dict(zip(ids, dbscan_parallel(coords, dim, eps, min_pts, metric, workers)))
+    elif backend == 'array':
+        ids, coords, dim = load_array_data(input_data_file_name)
+        start = record_phase('load', start)
+        labels, counts = dbscan_array(coords, dim, eps, min_pts, metric)
+        label_dict = dict(zip(ids, labels))
+    elif backend == 'tuple':
+        label_dict = {}
+        dataset = load_data(input_data_file_name, label_dict)
+        start = record_phase('load', start)
+        index = build_index(dataset, eps, index, metric)
+        start = record_phase('index', start)
+        dbscan(dataset, METRICS[metric], eps, min_pts, label_dict, index)
+    else:
+        raise ValueError(f'Unknown backend {backend}')
+    start = record_phase('cluster', start)
     cluster_groups = group_by_cluster(label_dict)
     sorted_n_groups = sort_n_groups_by_size(cluster_groups, n)
 
-    output_prefix = input_data_file_name.replace('.txt', '')
-
     write_clusters(sorted_n_groups, output_prefix)
+    record_phase('write', start)
+    write_metrics(metrics)
+
+
+OPTION_NAMES = ('index', 'metric', 'backend', 'workers', 'extract', 'optics_cache', 'state', 'insert', 'delete',
+                'metrics')  # keyword arguments of main
+
+
+def parse_arguments(argv) -> tuple:
+    # ['input1.txt', '8', '15', '22', '--index', 'kd-tree'] -> (['input1.txt', '8', '15', '22'], {'index': 'kd-tree'})
+    # An unknown option, or an option without a value, is reported and exits.
+    arguments = []
+    options = {}
+    i = 0
+    while i < len(argv):
+        if argv[i].startswith('--'):
+            name = argv[i][2:].replace('-', '_')
+            if name not in OPTION_NAMES:
+                print("<ERROR> Unknown option %s! (choose from %s)"
+                      % (argv[i], ", ".join('--' + option.replace('_', '-') for option in OPTION_NAMES)))
+                sys.exit(1)
+            if i + 1 >= len(argv):
+                print("<ERROR> Option %s needs a value!" % argv[i])
+                sys.exit(1)
+            options[name] = argv[i + 1]
+            i += 2
+        else:
+            arguments.append(argv[i])
+            i += 1
+    return arguments, options
 
 
 if __name__ == '__main__':
-    main(*sys.argv[1:])
+    arguments, options = parse_arguments(sys.argv[1:])
+    main(*arguments, **options)
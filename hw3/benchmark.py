@@ -0,0 +1,117 @@
+import sys
+import glob
+import os
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from measure import run_measured  # noqa: E402
+
+# Parameters of the inputs in input_data: (n, eps, min_pts)
+REFERENCE_PARAMETERS = {
+    'input1': ('8', '15', '22'),
+    'input2': ('5', '2', '7'),
+    'input3': ('4', '5', '5'),
+}
+
+# Scores of input_data so far (percent), and how much lower a score may be: border points which are within eps
+# of two clusters may go to either of them, depending on the mode.
+REFERENCE_BASELINES = {
+    'input1': 95.73,
+    'input2': 92.05,
+    'input3': 99.95,
+}
+REFERENCE_TOLERANCE = 0.1
+
+
+def generate_points(filename, num_of_points, num_of_blobs=8, noise_ratio=0.05, size=500.0, seed=0):
+    """
+        Write Gaussian blobs with uniform noise into the filename, in the input format of hw3 (id, x, y).
+
+        Parameters:
+            filename (str): File name to write. ex. "bench_input.txt"
+            num_of_points (int): Number of points
+            num_of_blobs (int): Number of blobs, with random centers, spreads and sizes
+            noise_ratio (float): Fraction of the points spread uniformly over the plane
+            size (float): The points are in [0, size) x [0, size), except the tails of the blobs
+            seed (int): Random seed
+    """
+    rng = random.Random(seed)
+    blobs = [(rng.uniform(0.1, 0.9) * size, rng.uniform(0.1, 0.9) * size, rng.uniform(0.01, 0.04) * size,
+              rng.uniform(0.5, 2.0)) for _ in range(num_of_blobs)]
+    weights = [weight for _, _, _, weight in blobs]
+    with open(filename, 'w') as file:
+        for object_id in range(num_of_points):
+            if rng.random() < noise_ratio:
+                x, y = rng.uniform(0, size), rng.uniform(0, size)
+            else:
+                center_x, center_y, spread, _ = rng.choices(blobs, weights)[0]
+                x, y = rng.gauss(center_x, spread), rng.gauss(center_y, spread)
+            file.write('%d\t%f\t%f\n' % (object_id, x, y))
+
+
+def run_dbscan(input_file_name, n, eps, min_pts, *options):
+    """
+        Run hw3 and return (wall time in seconds, peak RSS in KB).
+    """
+    script = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*_hw3.py'))[0]
+    return run_measured(script, input_file_name, n, eps, min_pts, *options)
+
+
+def read_clusters(pattern) -> list:
+    clusters = []
+    for filename in sorted(glob.glob(pattern)):
+        with open(filename, 'r') as file:
+            clusters.append({int(line) for line in file if line.strip()})
+    return clusters
+
+
+def check_references(*options):
+    """
+        Run hw3 on input_data and print the score against the ideal clusters of self_test:
+        the percentage of the ideal points which are in the output cluster best matching their ideal cluster.
+        Return True if no score is lower than its baseline (with REFERENCE_TOLERANCE).
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    all_passed = True
+    with tempfile.TemporaryDirectory() as temp_directory:
+        for name, (n, eps, min_pts) in REFERENCE_PARAMETERS.items():
+            input_file_name = os.path.join(temp_directory, name + '.txt')
+            shutil.copy(os.path.join(directory, 'input_data', name + '.txt'), input_file_name)
+            run_dbscan(input_file_name, n, eps, min_pts, *options)
+            clusters = read_clusters(os.path.join(temp_directory, name + '_cluster_*.txt'))
+            ideal_clusters = read_clusters(os.path.join(directory, 'self_test', name + '_cluster_*_ideal.txt'))
+            matched = sum(max((len(ideal & cluster) for cluster in clusters), default=0) for ideal in ideal_clusters)
+            total = sum(len(ideal) for ideal in ideal_clusters)
+            score = matched / total * 100
+            passed = score >= REFERENCE_BASELINES[name] - REFERENCE_TOLERANCE
+            all_passed = all_passed and passed
+            print("reference\t%s\t%.2f\t%s" % (name, score, 'ok' if passed else 'BELOW %.2f' % REFERENCE_BASELINES[name]))
+    return all_passed
+
+
+def main(sizes='5000,10000,20000', eps_values='5,10', min_pts_values='5,20', *options):
+    """
+        Print the wall time and the peak RSS of hw3 on blobs with noise for each size, eps and min_pts,
+        after checking the scores on input_data (exits with 1 if one is below its baseline). The options are passed to hw3.
+
+        ex. python benchmark.py 100000,1000000 5,10 5,20 --backend array
+    """
+    if not check_references(*options):
+        sys.exit(1)
+    input_file_name = 'bench_input.txt'
+    print("points\teps\tmin_pts\tseconds\tpeak_rss_kb")
+    for num_of_points in (int(size) for size in sizes.split(',')):
+        generate_points(input_file_name, num_of_points)
+        for eps in eps_values.split(','):
+            for min_pts in min_pts_values.split(','):
+                seconds, peak_rss = run_dbscan(input_file_name, 10, eps, min_pts, *options)
+                print("%d\t%s\t%s\t%.2f\t%d" % (num_of_points, eps, min_pts, seconds, peak_rss))
+    os.remove(input_file_name)
+    for filename in glob.glob('bench_input_cluster_*.txt'):
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
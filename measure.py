@@ -0,0 +1,23 @@
+import sys
+import subprocess
+import time
+
+# Runs a script as __main__ and prints its peak RSS (KB on Linux) to stderr.
+MEASURE_CODE = '''
+import resource, runpy, sys
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name='__main__')
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)
+'''
+
+
+def run_measured(script, *arguments):
+    """
+        Run the script with the arguments in a new interpreter, and return (wall time in seconds, peak RSS in KB).
+        Shared by the benchmarks of hw1, hw2 and hw3.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', MEASURE_CODE, script] + [str(argument) for argument in arguments],
+                               check=True, stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    return seconds, int(completed.stderr.strip().splitlines()[-1])